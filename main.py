@@ -1,5 +1,23 @@
+import time
+
+import_start = time.perf_counter()
+
+from argparse import ArgumentParser
+
+from src.controls import seed_argument
 from src.game import Game
+from src.loading import startup
+
+startup.start = import_start
+startup.record('imports', time.perf_counter() - import_start)
 
 if __name__ == "__main__":
-    game = Game()
+    parser = ArgumentParser()
+    parser.add_argument('--seed', type=seed_argument)
+    parser.add_argument('--record', help='save the input of this session to a replay file')
+    parser.add_argument('--replay', help='play back a replay file instead of reading input')
+    parser.add_argument('--startup-times', action='store_true', help='print how long each startup step took')
+    args = parser.parse_args()
+
+    game = Game(args.seed, args.record, args.replay, args.startup_times)
     game.run()
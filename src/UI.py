@@ -1,25 +1,96 @@
+from abc import ABC, abstractmethod
+
 import pygame
 
 from src.player import Player
 from src.settings import BASE_DIR
+from src.support import import_image
+
+
+class Widget(ABC):
+    def __init__(self, pos: tuple[int, int]):
+        self.pos = pos
+        self.surface = None
+
+    @abstractmethod
+    def state(self, player: Player):
+        # Everything the widget shows, the HUD is only redrawn when it changes
+        pass
+
+    @abstractmethod
+    def render(self, player: Player) -> pygame.Surface:
+        pass
+
+
+class Hearts(Widget):
+    def __init__(self, pos: tuple[int, int], spacing: int = 10):
+        super().__init__(pos)
+        self.spacing = spacing
+
+        # Surfaces
+        self.full_heart_surf = import_image(BASE_DIR / "graphics" / "heart" / "hearts_hud.png")
+        self.empty_heart_surf = import_image(BASE_DIR / "graphics" / "heart" / "no_hearts_hud.png")
+
+    def state(self, player: Player) -> tuple[int, int]:
+        return player.health, player.max_health
+
+    def render(self, player: Player) -> pygame.Surface:
+        width, height = self.full_heart_surf.get_size()
+        surface = pygame.Surface(((width + self.spacing) * player.max_health - self.spacing, height), pygame.SRCALPHA)
+        for i in range(player.max_health):
+            heart_surf = self.full_heart_surf if (i + 1) <= player.health else self.empty_heart_surf
+            surface.blit(heart_surf, ((width + self.spacing) * i, 0))
+        return surface
 
 
 class UI:
     def __init__(self):
         # Setup
         self.display_surface = pygame.display.get_surface()
+        self.widgets = [Hearts((0, 10))]
 
-        # Surfaces
-        self.full_heart_surf = pygame.image.load(BASE_DIR / "graphics" / "heart" / "hearts_hud.png").convert_alpha()
-        self.empty_heart_surf = pygame.image.load(BASE_DIR / "graphics" / "heart" / "no_hearts_hud.png").convert_alpha()
+        # Cache, every widget composed on one surface
+        self.surface = None
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        self.states = None
 
-    def draw(self, player: Player):
-        for i in range(player.max_health):
-            if (i + 1) <= player.health:
-                full_heart_rect = pygame.Rect((10 * i) + (self.full_heart_surf.get_width() * i), 10,
-                                              self.full_heart_surf.get_width(), self.full_heart_surf.get_height())
-                self.display_surface.blit(self.full_heart_surf, full_heart_rect)
-            else:
-                empty_hearth_rect = pygame.Rect((10 * i) + (self.empty_heart_surf.get_width() * i), 10,
-                                                self.empty_heart_surf.get_width(), self.empty_heart_surf.get_height())
-                self.display_surface.blit(self.empty_heart_surf, empty_hearth_rect)
+    def add_widget(self, widget: Widget):
+        self.widgets.append(widget)
+        self.states = None
+
+    def update(self, player: Player) -> list[pygame.Rect]:
+        # Returns the screen areas that changed
+        states = [widget.state(player) for widget in self.widgets]
+        if states == self.states:
+            return []
+
+        # Only the widgets whose state changed are rendered again
+        previous_states = self.states or [None] * len(self.widgets)
+        for widget, state, previous_state in zip(self.widgets, states, previous_states):
+            if state != previous_state or widget.surface is None:
+                widget.surface = widget.render(player)
+        self.states = states
+
+        old_rect = self.rect
+        self.compose()
+        return [old_rect, self.rect]
+
+    def compose(self):
+        rects = [widget.surface.get_rect(topleft=widget.pos) for widget in self.widgets]
+        self.rect = rects[0].unionall(rects) if rects else pygame.Rect(0, 0, 0, 0)
+        self.surface = pygame.Surface(self.rect.size, pygame.SRCALPHA)
+        self.surface.blits([(widget.surface, rect.move(-self.rect.x, -self.rect.y))
+                            for widget, rect in zip(self.widgets, rects)], False)
+
+    def draw(self, dirty_rects: list[pygame.Rect] = None):
+        if self.surface is None:
+            return
+        if dirty_rects is None:
+            self.display_surface.blit(self.surface, self.rect)
+            return
+
+        # Only inside the redrawn areas, the HUD elsewhere is still on screen
+        for area in dirty_rects:
+            area = area.clip(self.rect)
+            if area.width and area.height:
+                self.display_surface.blit(self.surface, area, area.move(-self.rect.x, -self.rect.y))
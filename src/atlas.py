@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import tempfile
+from argparse import ArgumentParser
+from pathlib import Path
+
+import pygame
+
+from src.settings import BASE_DIR, ATLAS_DIR, ATLAS_MAX_WIDTH
+
+GRAPHICS_DIR = BASE_DIR / 'graphics'
+ATLAS_VERSION = 1
+ATLAS_PADDING = 1
+
+# Animation strips, like waterfall_anim_strip_4.png, are sliced into a folder of frames
+STRIP_PATTERN = re.compile(r'(?P<name>.+)_strip_(?P<count>\d+)$')
+
+
+def asset_groups() -> dict[str, list[Path]]:
+    # One atlas per folder of graphics, and one per loose animation strip
+    groups = {}
+    for entry in sorted(GRAPHICS_DIR.iterdir()):
+        if entry.is_dir() and entry != ATLAS_DIR:
+            groups[entry.name] = sorted(entry.rglob('*.png'))
+        elif entry.suffix == '.png' and STRIP_PATTERN.match(entry.stem):
+            groups[STRIP_PATTERN.match(entry.stem)['name']] = [entry]
+    return groups
+
+
+def source_key(path: Path) -> str:
+    return path.relative_to(GRAPHICS_DIR).as_posix()
+
+
+def source_mtimes(sources: list[Path]) -> dict[str, int]:
+    return {source_key(source): source.stat().st_mtime_ns for source in sources}
+
+
+def shelf_pack(sizes: list[tuple[int, int]], max_width: int) -> tuple[list[tuple[int, int]], tuple[int, int]]:
+    # Rows of images sorted by height, returns the positions and the atlas size
+    max_width = max([max_width] + [width + ATLAS_PADDING for width, _ in sizes])
+    positions = [None] * len(sizes)
+    x = y = row_height = width = 0
+    for index in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        image_width, image_height = sizes[index]
+        if x + image_width > max_width:
+            x = 0
+            y += row_height + ATLAS_PADDING
+            row_height = 0
+        positions[index] = (x, y)
+        x += image_width + ATLAS_PADDING
+        row_height = max(row_height, image_height)
+        width = max(width, x - ATLAS_PADDING)
+    return positions, (width, y + row_height)
+
+
+def write_atomic(path: Path, data: bytes):
+    # Written next to path and renamed over it, so a reader in another process never sees half a file
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f'{path.name}.', suffix='.tmp', delete=False) as file:
+        file.write(data)
+    try:
+        os.replace(file.name, path)
+    except OSError:
+        os.remove(file.name)
+        raise
+
+
+def pack_group(name: str, sources: list[Path], directory: Path = ATLAS_DIR) -> dict:
+    images = [pygame.image.load(source) for source in sources]
+    positions, size = shelf_pack([image.get_size() for image in images], ATLAS_MAX_WIDTH)
+
+    atlas = pygame.Surface(size, pygame.SRCALPHA)
+    manifest = {'version': ATLAS_VERSION, 'sources': source_mtimes(sources), 'size': size, 'images': {}, 'folders': {}}
+    for source, image, (x, y) in zip(sources, images, positions):
+        atlas.blit(image, (x, y))
+        key = source_key(source)
+        width, height = image.get_size()
+        manifest['images'][key] = [x, y, width, height]
+
+        strip = STRIP_PATTERN.match(source.stem)
+        if strip:
+            folder = source.with_name(strip['name'])
+            frame_width = width // int(strip['count'])
+            frames = [[x + i * frame_width, y, frame_width, height] for i in range(int(strip['count']))]
+        else:
+            folder = source.parent
+            frames = [manifest['images'][key]]
+        manifest['folders'].setdefault(source_key(folder), []).extend(frames)
+
+    directory.mkdir(parents=True, exist_ok=True)
+    # Raw pixels, much faster to load than a png decode, and the manifest last as it is what marks the atlas valid
+    write_atomic(directory / f'{name}.rgba', pygame.image.tobytes(atlas, 'RGBA'))
+    write_atomic(directory / f'{name}.json', json.dumps(manifest).encode())
+    return manifest
+
+
+class Atlas:
+    def __init__(self, image: pygame.Surface, manifest: dict):
+        self.image = image
+        self.images = manifest['images']
+        self.folders = manifest['folders']
+
+    def get_image(self, key: str) -> pygame.Surface:
+        return self.image.subsurface(self.images[key])
+
+    def get_folder(self, key: str) -> list[pygame.Surface]:
+        return [self.image.subsurface(rect) for rect in self.folders[key]]
+
+
+class AtlasLoader:
+    def __init__(self, directory: Path = ATLAS_DIR):
+        self.directory = directory
+        self.groups = None
+        self.atlases = {}
+
+    def read_manifest(self, name: str, sources: list[Path]) -> dict:
+        # Packed atlas, valid as long as none of its images changed
+        manifest_path = self.directory / f'{name}.json'
+        if manifest_path.exists() and (self.directory / f'{name}.rgba').exists():
+            try:
+                manifest = json.loads(manifest_path.read_text())
+                if manifest['version'] == ATLAS_VERSION and manifest['sources'] == source_mtimes(sources):
+                    return manifest
+            except (ValueError, KeyError):
+                pass
+        return pack_group(name, sources, self.directory)
+
+    def get_atlas(self, path: Path) -> Atlas:
+        # The atlas a graphics path belongs to, None for paths outside of every group
+        try:
+            name = Path(path).absolute().relative_to(GRAPHICS_DIR).parts[0]
+        except (ValueError, IndexError):
+            return None
+        strip = STRIP_PATTERN.match(Path(name).stem)
+        if strip:
+            name = strip['name']
+
+        if name not in self.atlases:
+            if self.groups is None:
+                self.groups = asset_groups()
+            if name not in self.groups:
+                return None
+            self.add(name, *self.read(name, self.groups[name]))
+        return self.atlases[name]
+
+    def read(self, name: str, sources: list[Path]) -> tuple[dict, pygame.Surface]:
+        # File access and decoding only, safe to run on a worker thread
+        manifest = self.read_manifest(name, sources)
+        pixels = (self.directory / f'{name}.rgba').read_bytes()
+        return manifest, pygame.image.frombytes(pixels, manifest['size'], 'RGBA')
+
+    def add(self, name: str, manifest: dict, image: pygame.Surface) -> Atlas:
+        # The conversion to the display format needs the main thread
+        self.atlases[name] = Atlas(image.convert_alpha(), manifest)
+        return self.atlases[name]
+
+    def load_folder(self, path: Path) -> list[pygame.Surface]:
+        atlas = self.get_atlas(path)
+        if atlas is None:
+            return None
+        key = source_key(Path(path).absolute())
+        if key not in atlas.folders:
+            return None
+        return atlas.get_folder(key)
+
+    def load_image(self, path: Path) -> pygame.Surface:
+        atlas = self.get_atlas(path)
+        if atlas is None:
+            return None
+        key = source_key(Path(path).absolute())
+        if key not in atlas.images:
+            return None
+        return atlas.get_image(key)
+
+    def clear(self):
+        self.groups = None
+        self.atlases.clear()
+
+
+atlases = AtlasLoader()
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Pack the graphics folders into one atlas image and manifest each.')
+    parser.add_argument('groups', nargs='*', help='groups to pack, all of them by default')
+    args = parser.parse_args()
+
+    for group_name, group_sources in asset_groups().items():
+        if args.groups and group_name not in args.groups:
+            continue
+        pack_group(group_name, group_sources)
+        print(f"{group_name:<16} {len(group_sources):>4} images -> {ATLAS_DIR / f'{group_name}.rgba'}")
@@ -0,0 +1,214 @@
+import json
+import multiprocessing
+import platform
+import subprocess
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from statistics import mean
+
+import pygame
+
+from src.controls import Actions, ScriptedControls, Replay, ReplayControls
+from src.headless import Simulation
+from src.map_cache import CompiledMap, read_map
+from src.settings import BASE_DIR, TILE_SIZE
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def scripted_run(frame: int) -> Actions:
+    # Run back and forth, jumping, attacking and dashing on a fixed rhythm
+    move = 1 if (frame // 480) % 2 == 0 else -1
+    return Actions(
+        move=move,
+        jump=frame % 90 < 10,
+        attack=frame % 60 == 30,
+        dash=frame % 240 == 120,
+        aim='bottom' if frame % 300 == 30 else None
+    )
+
+
+def repeat_map(data: dict, repeat_x: int, repeat_y: int = 1, enemy_copies: int = 1) -> dict:
+    width, height = data['width'], data['height']
+
+    layers = {}
+    for name, tiles in data['layers'].items():
+        layers[name] = [(x + width * i, y + height * j, gid)
+                        for i in range(repeat_x) for j in range(repeat_y) for x, y, gid in tiles]
+
+    objects = {}
+    for name, group in data['objects'].items():
+        objects[name] = []
+        for i in range(repeat_x):
+            for j in range(repeat_y):
+                for obj in group:
+                    copies = enemy_copies if obj['type'] == 'Enemy' else 1
+                    for copy in range(copies):
+                        objects[name].append(dict(obj, x=obj['x'] + width * TILE_SIZE * i + copy * 4,
+                                                  y=obj['y'] + height * TILE_SIZE * j))
+
+    # Stress rooms are dead ends
+    objects['Exit'] = []
+
+    return dict(data, width=width * repeat_x, height=height * repeat_y, layers=layers, objects=objects)
+
+
+SCENES = {
+    'map_test': {'start': (128, 576)},
+    'map_test_2': {'start': (704, 832)},
+    'stress_terrain': {'start': (128, 576), 'base': 'map_test', 'repeat_x': 8, 'repeat_y': 4},
+    'stress_enemies': {'start': (128, 576), 'base': 'map_test', 'repeat_x': 5, 'enemy_copies': 25},
+    'stress_particules': {'start': (128, 576), 'base': 'map_test', 'particules': 30},
+}
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def frame_stats(frame_times: list[float]) -> dict:
+    return {
+        'mean': mean(frame_times),
+        'p50': percentile(frame_times, 0.5),
+        'p90': percentile(frame_times, 0.9),
+        'p99': percentile(frame_times, 0.99),
+        'max': max(frame_times)
+    }
+
+
+def peak_memory() -> int:
+    # High water mark of the whole process, so only meaningful in a process running a single scene
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if platform.system() == 'Darwin' else rss * 1024
+
+
+def run_isolated(func, *args) -> dict:
+    # A fresh process per scene, so its peak memory is not one left by an earlier scene
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(func, *args).result()
+
+
+def run_scene(name: str, frames: int, seed: int) -> dict:
+    scene = SCENES[name]
+    simulation = Simulation(seed, render=True, controls=ScriptedControls(scripted_run))
+    level = simulation.level
+
+    # Map load, from the compiled cache but without the in-memory copy
+    start = time.perf_counter()
+    if 'base' in scene:
+        data = repeat_map(read_map(scene['base']), scene.get('repeat_x', 1), scene.get('repeat_y', 1),
+                          scene.get('enemy_copies', 1))
+        level.map_loader.maps[name] = CompiledMap(data)
+    else:
+        level.map_loader.maps.pop(name, None)
+    level.load_map(name, *scene['start'])
+    load_time = time.perf_counter() - start
+
+    frame_times = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        for i in range(scene.get('particules', 0)):
+            level.create_particules('after_jump', (level.player.rect.x + i * 8 - 120, level.player.rect.y))
+        simulation.step()
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'frames': frames,
+        'sprites': len(level.all_sprites),
+        'enemies': len(level.enemy_sprites),
+        'map_load_ms': load_time * 1000,
+        'frame_ms': frame_stats(frame_times),
+        'peak_memory': peak_memory()
+    }
+
+
+def run_replay(path: str) -> dict:
+    # The replay starts on the map the simulation loads, so only the whole setup can be timed
+    replay = Replay.load(path)
+    start = time.perf_counter()
+    simulation = Simulation(replay.seed, replay.dt, True, ReplayControls(replay), replay.level_name)
+    startup_time = time.perf_counter() - start
+
+    frame_times = []
+    while not simulation.level.controls.finished:
+        start = time.perf_counter()
+        simulation.step()
+        frame_times.append((time.perf_counter() - start) * 1000)
+
+    return {
+        'frames': len(frame_times),
+        'sprites': len(simulation.level.all_sprites),
+        'enemies': len(simulation.level.enemy_sprites),
+        'startup_ms': startup_time * 1000,
+        'frame_ms': frame_stats(frame_times),
+        'peak_memory': peak_memory(),
+        'state': simulation.state_digest()
+    }
+
+
+def load_ms(result: dict) -> float:
+    # Map load of a scene, or startup of a replay
+    return result['map_load_ms'] if 'map_load_ms' in result else result['startup_ms']
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(old_path: str, new_path: str):
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+
+    print(f"{'scene':<20}{'p50 ms':>18}{'p99 ms':>18}{'load ms':>18}")
+    for name, result in new['scenes'].items():
+        if name not in old['scenes']:
+            continue
+        before = old['scenes'][name]
+        cells = [f"{before['frame_ms'][key]:.2f} -> {result['frame_ms'][key]:.2f}" for key in ('p50', 'p99')]
+        cells.append(f"{load_ms(before):.1f} -> {load_ms(result):.1f}")
+        print(f'{name:<20}' + ''.join(f'{cell:>18}' for cell in cells))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Run scripted scenes headless and report frame time statistics.')
+    parser.add_argument('--frames', type=int, default=1200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--scenes', nargs='+', choices=list(SCENES), default=list(SCENES))
+    parser.add_argument('--output', default='benchmark.json')
+    parser.add_argument('--replay', nargs='+', default=[], help='replay files to benchmark as extra scenes')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    else:
+        report = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'seed': args.seed,
+            'scenes': {}
+        }
+        results = [(name, run_scene, (name, args.frames, args.seed)) for name in args.scenes]
+        results += [(f'replay:{Path(path).name}', run_replay, (path,)) for path in args.replay]
+        for scene_name, run, run_args in results:
+            report['scenes'][scene_name] = result = run_isolated(run, *run_args)
+            print(f"{scene_name:<20} p50 {result['frame_ms']['p50']:6.2f} ms  p99 {result['frame_ms']['p99']:6.2f} ms  "
+                  f"load {load_ms(result):7.1f} ms")
+
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f'Saved to {args.output}')
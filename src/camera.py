@@ -1,9 +1,9 @@
-from random import randint
-
 import pygame
 
 from src.player import Player
-from src.settings import CAMERA_BORDERS, LAYERS
+from src.profiler import profiler
+from src.settings import CAMERA_BORDERS, LAYERS, BG_COLOR
+from src.support import effects_rng
 from src.tile import Tile
 
 
@@ -21,16 +21,55 @@ class CameraGroup(pygame.sprite.Group):
 
         self.camera_rect = pygame.Rect(cam_left, cam_top, cam_width, cam_height)
 
-    def custom_draw(self, player: Player, screen_shake: bool):
+        # Layers
+        self.layers = {layer: [] for layer in LAYERS.values()}
+        self.layers_dirty = True
+        self.renderers = {}
+
+        # Dirty rects, what was drawn on screen last frame
+        self.drawn = None
+        self.drawn_renderers = {}
+        self.drawn_offset = (0, 0)
+
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer=None):
+        super().add_internal(sprite, layer)
+        self.layers_dirty = True
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite):
+        super().remove_internal(sprite)
+        self.layers_dirty = True
+
+    def add_renderer(self, layer: int, renderer):
+        # renderer draws itself on top of the sprites of its layer, rects() gives the screen areas it covers
+        self.renderers[layer] = renderer
+
+    def sort_layers(self):
+        for sprites in self.layers.values():
+            sprites.clear()
+        for sprite in self.sprites():  # type: Tile
+            self.layers[sprite.z].append(sprite)
+        self.layers_dirty = False
+
+    @staticmethod
+    def interpolate(sprite: pygame.sprite.Sprite, alpha: float) -> tuple[float, float]:
+        old_rect = getattr(sprite, 'old_rect', None)
+        if old_rect is None or alpha >= 1:
+            return sprite.rect.topleft
+        return (old_rect.x + (sprite.rect.x - old_rect.x) * alpha,
+                old_rect.y + (sprite.rect.y - old_rect.y) * alpha)
+
+    def follow(self, player: Player, screen_shake: bool, alpha: float) -> tuple[int, int]:
         # getting the camera position
-        if player.rect.left < self.camera_rect.left:
-            self.camera_rect.left = player.rect.left
-        if player.rect.right > self.camera_rect.right:
-            self.camera_rect.right = player.rect.right
-        if player.rect.top < self.camera_rect.top:
-            self.camera_rect.top = player.rect.top
-        if player.rect.bottom > self.camera_rect.bottom:
-            self.camera_rect.bottom = player.rect.bottom
+        player_rect = player.rect.copy()
+        player_rect.topleft = self.interpolate(player, alpha)
+        if player_rect.left < self.camera_rect.left:
+            self.camera_rect.left = player_rect.left
+        if player_rect.right > self.camera_rect.right:
+            self.camera_rect.right = player_rect.right
+        if player_rect.top < self.camera_rect.top:
+            self.camera_rect.top = player_rect.top
+        if player_rect.bottom > self.camera_rect.bottom:
+            self.camera_rect.bottom = player_rect.bottom
 
         # Camera offset
         self.offset = pygame.math.Vector2(
@@ -41,15 +80,141 @@ class CameraGroup(pygame.sprite.Group):
         # Screen shake
         offset_screen_shake = pygame.math.Vector2()
         if screen_shake:
-            offset_screen_shake.x = randint(-4, 4)
-            offset_screen_shake.y = randint(-4, 4)
+            offset_screen_shake.x = effects_rng.randint(-4, 4)
+            offset_screen_shake.y = effects_rng.randint(-4, 4)
+
+        if self.layers_dirty:
+            self.sort_layers()
+
+        return int(offset_screen_shake.x - self.offset.x), int(offset_screen_shake.y - self.offset.y)
+
+    def custom_draw(self, player: Player, screen_shake: bool, alpha: float = 1):
+        offset_x, offset_y = self.follow(player, screen_shake, alpha)
 
         # Draw sprites
-        for layer in LAYERS.values():
-            for sprite in self.sprites():  # type: Tile
-                if sprite.z == layer:
-                    offset_pos = sprite.rect.topleft - self.offset + offset_screen_shake
-                    self.display_surface.blit(sprite.image, offset_pos)
+        view_rect = self.display_surface.get_rect(topleft=self.offset).inflate(8, 8)
+        for layer, sprites in self.layers.items():
+            blits = []
+            for sprite in sprites:
+                if sprite.rect.colliderect(view_rect):
+                    x, y = self.interpolate(sprite, alpha)
+                    blits.append((sprite.image, (x + offset_x, y + offset_y)))
+            self.display_surface.blits(blits, False)
+            profiler.count('blits', len(blits))
+
+            if layer in self.renderers:
+                renderer_offset = pygame.math.Vector2(-offset_x, -offset_y)
+                profiler.count('blits', self.renderers[layer].draw(self.display_surface, renderer_offset))
+
+        # The next dirty rect frame can't reuse this one
+        self.drawn = None
+
+    def snapshot(self, origin: tuple[int, int]) -> dict:
+        # The offset follows from the camera rect on the next draw
+        return {'rect': [self.camera_rect.x - origin[0], self.camera_rect.y - origin[1]]}
+
+    def restore(self, state: dict, origin: tuple[int, int]):
+        self.camera_rect.topleft = (state['rect'][0] + origin[0], state['rect'][1] + origin[1])
+        self.invalidate()
+
+    def invalidate(self):
+        self.drawn = None
+
+    @staticmethod
+    def merge_rects(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+        merged = []
+        for rect in rects:
+            if rect.width <= 0 or rect.height <= 0:
+                continue
+            index = rect.collidelist(merged)
+            while index != -1:
+                rect = rect.union(merged.pop(index))
+                index = rect.collidelist(merged)
+            merged.append(rect)
+        return merged
+
+    def draw_dirty(self, player: Player, screen_shake: bool, alpha: float = 1, fixed_rects: list[pygame.Rect] = (),
+                   changed_rects: list[pygame.Rect] = ()) -> tuple[list[pygame.Rect], list[pygame.Rect]]:
+        # Redraws only what changed since the last frame, returns the redrawn and the updated screen areas.
+        # fixed_rects are screen space overlays drawn after the camera, changed_rects need redrawing this frame.
+        offset_x, offset_y = self.follow(player, screen_shake, alpha)
+        screen_rect = self.display_surface.get_rect()
+        renderer_offset = pygame.math.Vector2(-offset_x, -offset_y)
+
+        # Where every visible sprite lands on screen this frame
+        view_rect = self.display_surface.get_rect(topleft=self.offset).inflate(8, 8)
+        drawn = {}
+        layer_blits = []
+        for layer, sprites in self.layers.items():
+            blits = []
+            for sprite in sprites:
+                if sprite.rect.colliderect(view_rect):
+                    # baked chunks are redrawn in place, without a new image
+                    changed = getattr(sprite, 'dirty', False)
+                    x, y = self.interpolate(sprite, alpha)
+                    image = sprite.image
+                    rect = image.get_rect(topleft=(x + offset_x, y + offset_y))
+                    drawn[sprite] = (rect, image, changed)
+                    blits.append((image, rect))
+            layer_blits.append((layer, blits))
+        drawn_renderers = {layer: renderer.rects(renderer_offset) for layer, renderer in self.renderers.items()}
+
+        scroll_x, scroll_y = offset_x - self.drawn_offset[0], offset_y - self.drawn_offset[1]
+        if self.drawn is None or abs(scroll_x) >= screen_rect.width or abs(scroll_y) >= screen_rect.height:
+            redraw = [screen_rect]
+            update = [screen_rect]
+        else:
+            redraw = list(changed_rects)
+
+            # Camera scroll, the screen is moved and only the uncovered strips are redrawn
+            if scroll_x or scroll_y:
+                self.display_surface.scroll(scroll_x, scroll_y)
+                if scroll_x > 0:
+                    redraw.append(pygame.Rect(0, 0, scroll_x, screen_rect.height))
+                elif scroll_x < 0:
+                    redraw.append(pygame.Rect(screen_rect.width + scroll_x, 0, -scroll_x, screen_rect.height))
+                if scroll_y > 0:
+                    redraw.append(pygame.Rect(0, 0, screen_rect.width, scroll_y))
+                elif scroll_y < 0:
+                    redraw.append(pygame.Rect(0, screen_rect.height + scroll_y, screen_rect.width, -scroll_y))
+                for rect in fixed_rects:
+                    redraw += [rect, rect.move(scroll_x, scroll_y)]
+
+            # Moved, animated, added and removed sprites
+            for sprite, (rect, image, changed) in drawn.items():
+                previous = self.drawn.get(sprite)
+                if previous is None:
+                    redraw.append(rect)
+                    continue
+                previous_rect = previous[0].move(scroll_x, scroll_y)
+                if changed or previous_rect != rect or previous[1] is not image:
+                    redraw += [previous_rect, rect]
+            for sprite, previous in self.drawn.items():
+                if sprite not in drawn:
+                    redraw.append(previous[0].move(scroll_x, scroll_y))
+            for layer, rects in drawn_renderers.items():
+                redraw += [rect.move(scroll_x, scroll_y) for rect in self.drawn_renderers.get(layer, [])] + rects
+
+            redraw = self.merge_rects([rect.clip(screen_rect) for rect in redraw])
+            update = [screen_rect] if scroll_x or scroll_y else redraw
+
+        # Redraw the background and every layer inside each dirty area
+        for area in redraw:
+            self.display_surface.set_clip(area)
+            self.display_surface.fill(BG_COLOR)
+            for layer, blits in layer_blits:
+                blits = [blit for blit in blits if blit[1].colliderect(area)]
+                self.display_surface.blits(blits, False)
+                profiler.count('blits', len(blits))
+                if layer in self.renderers:
+                    profiler.count('blits', self.renderers[layer].draw(self.display_surface, renderer_offset))
+        self.display_surface.set_clip(None)
+        profiler.count('dirty_rects', len(redraw))
+
+        self.drawn = drawn
+        self.drawn_renderers = drawn_renderers
+        self.drawn_offset = (offset_x, offset_y)
+        return redraw, update
 
     def draw_debug(self):
         # camera offset
@@ -61,8 +226,3 @@ class CameraGroup(pygame.sprite.Group):
         for sprite in self.sprites():
             if hasattr(sprite, 'draw_debug'):
                 sprite.draw_debug(self.display_surface, self.offset)
-
-    def empty(self):
-        for sprite in self.sprites():
-            if not hasattr(sprite, 'input'):
-                sprite.kill()
@@ -0,0 +1,83 @@
+import pygame
+
+from src.settings import CHUNK_SIZE, LAYERS, TILE_SIZE
+from src.tilemap import TileMap
+
+# Stands in for transparency on chunks whose tiles have no partly transparent pixel
+CHUNK_COLORKEY = (255, 0, 255)
+
+
+def colorkey_safe(surf: pygame.Surface) -> bool:
+    # Every pixel fully opaque or fully transparent, and none of them the colorkey
+    if surf.get_flags() & pygame.SRCALPHA:
+        if pygame.mask.from_surface(surf, 0).count() != pygame.mask.from_surface(surf, 254).count():
+            return False
+    return not pygame.mask.from_threshold(surf, CHUNK_COLORKEY, (1, 1, 1, 255)).count()
+
+
+class TerrainChunk(pygame.sprite.Sprite):
+    def __init__(self, pos: tuple[int, int], tile_map: TileMap, groups: list[pygame.sprite.AbstractGroup],
+                 z: int = LAYERS['terrain'], colorkey: bool = False):
+        # Setup
+        size = CHUNK_SIZE * TILE_SIZE
+        self.rect = pygame.Rect(pos, (size, size))
+        self.tile_map = tile_map
+        self.z = z
+        super().__init__(groups)
+
+        # Cache, only made when the chunk is first drawn
+        self.colorkey = colorkey
+        self.surface = None
+        self.dirty = True
+
+    @property
+    def image(self) -> pygame.Surface:
+        if self.dirty:
+            self.bake()
+        return self.surface
+
+    def bake(self):
+        # The cells of the tile map under the chunk, as they are now
+        tile_map = self.tile_map
+        x = tile_map.origin[0] - self.rect.x
+        y = tile_map.origin[1] - self.rect.y
+        if self.surface is None:
+            self.surface = self.make_surface()
+        self.surface.fill(CHUNK_COLORKEY if self.colorkey else (0, 0, 0, 0))
+        self.surface.blits([(tile_map.tileset[gid], (x + col * TILE_SIZE, y + row * TILE_SIZE))
+                            for col, row, gid in tile_map.cells(self.rect)], False)
+        self.dirty = False
+
+    def make_surface(self) -> pygame.Surface:
+        # Colorkeyed and run length encoded blits much faster than per pixel alpha
+        if self.colorkey:
+            surface = pygame.Surface(self.rect.size).convert()
+            surface.set_colorkey(CHUNK_COLORKEY, pygame.RLEACCEL)
+            return surface
+        return pygame.Surface(self.rect.size, pygame.SRCALPHA).convert_alpha()
+
+    def draw_debug(self, display_surface: pygame.Surface, offset: pygame.math.Vector2):
+        for col, row, _ in self.tile_map.cells(self.rect):
+            pygame.draw.rect(display_surface, 'white', self.tile_map.cell_rect(col, row).move(-offset.x, -offset.y), 3)
+
+
+class StaticLayer:
+    def __init__(self, tile_map: TileMap, groups: list[pygame.sprite.AbstractGroup], z: int = LAYERS['terrain']):
+        # Drawn in chunks baked from tile_map, which tells the layer whenever one of its cells changes
+        self.tile_map = tile_map
+        self.groups = groups
+        self.z = z
+        self.chunks = {}
+        self.colorkey = all(colorkey_safe(surf) for surf in tile_map.tileset if surf is not None)
+        tile_map.static_layers.append(self)
+
+    def get_chunk(self, pos: tuple[int, int]) -> TerrainChunk:
+        size = CHUNK_SIZE * TILE_SIZE
+        key = (pos[0] // size, pos[1] // size)
+        if key not in self.chunks:
+            self.chunks[key] = TerrainChunk((key[0] * size, key[1] * size), self.tile_map, self.groups, self.z,
+                                             self.colorkey)
+        return self.chunks[key]
+
+    def tile_changed(self, col: int, row: int):
+        self.get_chunk(self.tile_map.cell_rect(col, row).topleft).dirty = True
@@ -0,0 +1,35 @@
+import pygame
+
+
+class WallClock:
+    def get_ticks(self) -> int:
+        return pygame.time.get_ticks()
+
+
+class SimulationClock:
+    def __init__(self, ticks: float = 0):
+        self.ticks = ticks
+        self.time_scale = 1
+        self.paused = False
+
+    def advance(self, dt: float) -> float:
+        if self.paused:
+            return 0
+        dt *= self.time_scale
+        self.ticks += dt * 1000
+        return dt
+
+    def get_ticks(self) -> int:
+        return int(self.ticks)
+
+
+clock = WallClock()
+
+
+def set_clock(new_clock):
+    global clock
+    clock = new_clock
+
+
+def get_ticks() -> int:
+    return clock.get_ticks()
@@ -0,0 +1,54 @@
+import math
+from typing import Optional
+
+import pygame
+
+
+class Contact:
+    def __init__(self, time: float, normal: tuple[int, int], rect: pygame.Rect):
+        # time is the fraction of the move done before touching rect, normal points out of rect
+        self.time = time
+        self.normal = normal
+        self.rect = rect
+
+
+def sweep_axis(start: int, end: int, obstacle_start: int, obstacle_end: int, velocity: float) -> tuple[float, float]:
+    # When the moving span enters and leaves the obstacle span, as fractions of the move
+    if velocity > 0:
+        return (obstacle_start - end) / velocity, (obstacle_end - start) / velocity
+    if velocity < 0:
+        return (obstacle_end - start) / velocity, (obstacle_start - end) / velocity
+    if end <= obstacle_start or start >= obstacle_end:
+        return math.inf, -math.inf
+    return -math.inf, math.inf
+
+
+def sweep(rect: pygame.Rect, velocity: tuple[float, float], obstacles: list[pygame.Rect]) -> Optional[Contact]:
+    # First obstacle hit by rect moving along velocity, obstacles it already overlaps are ignored
+    dx, dy = velocity
+    first = None
+    for obstacle in obstacles:
+        entry_x, exit_x = sweep_axis(rect.left, rect.right, obstacle.left, obstacle.right, dx)
+        entry_y, exit_y = sweep_axis(rect.top, rect.bottom, obstacle.top, obstacle.bottom, dy)
+        entry = max(entry_x, entry_y)
+        if entry >= min(exit_x, exit_y) or not 0 <= entry <= 1:
+            continue
+        if first is None or entry < first.time:
+            normal = (-int(math.copysign(1, dx)), 0) if entry_x > entry_y else (0, -int(math.copysign(1, dy)))
+            first = Contact(entry, normal, obstacle)
+    return first
+
+
+def push_out(rect: pygame.Rect, obstacles: list[pygame.Rect]) -> tuple[int, int]:
+    # Offset moving rect out of the obstacles it overlaps, each time along the axis it is the least deep in
+    def overlap(obstacle: pygame.Rect) -> int:
+        clip = rect.clip(obstacle)
+        return clip.width * clip.height
+
+    moved = rect.copy()
+    for obstacle in sorted(obstacles, key=overlap, reverse=True):
+        if moved.colliderect(obstacle):
+            pushes = [(obstacle.left - moved.right, 0), (obstacle.right - moved.left, 0),
+                      (0, obstacle.top - moved.bottom), (0, obstacle.bottom - moved.top)]
+            moved.move_ip(min(pushes, key=lambda push: abs(push[0]) + abs(push[1])))
+    return moved.x - rect.x, moved.y - rect.y
@@ -0,0 +1,168 @@
+import struct
+import zlib
+from argparse import ArgumentTypeError
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import pygame
+
+JOYSTICK_DEAD_ZONE = 0.3
+
+
+class Actions(NamedTuple):
+    move: float = 0
+    jump: bool = False
+    attack: bool = False
+    dash: bool = False
+    aim: Optional[str] = None
+
+
+def read_keyboard() -> Actions:
+    keys = pygame.key.get_pressed()
+
+    if keys[pygame.K_RIGHT]:
+        move = 1
+    elif keys[pygame.K_LEFT]:
+        move = -1
+    else:
+        move = 0
+
+    if keys[pygame.K_UP]:
+        aim = 'top'
+    elif keys[pygame.K_DOWN]:
+        aim = 'bottom'
+    else:
+        aim = None
+
+    return Actions(move, keys[pygame.K_SPACE], keys[pygame.K_q], keys[pygame.K_RCTRL], aim)
+
+
+def read_joystick(joystick: pygame.joystick.Joystick) -> Actions:
+    move = joystick.get_axis(0)
+    if abs(move) < JOYSTICK_DEAD_ZONE:
+        move = 0
+
+    # Without horizontal input, the stick aims the attack up or down
+    aim = None
+    if move == 0:
+        vertical = joystick.get_axis(1)
+        if vertical <= -JOYSTICK_DEAD_ZONE:
+            aim = 'top'
+        elif vertical >= JOYSTICK_DEAD_ZONE:
+            aim = 'bottom'
+
+    return Actions(move, bool(joystick.get_button(0)), bool(joystick.get_button(2)), bool(joystick.get_button(5)),
+                   aim)
+
+
+class ScriptedControls:
+    def __init__(self, script):
+        # script is a function of the frame number returning Actions
+        self.script = script
+        self.frame = 0
+
+    def get_actions(self) -> Actions:
+        actions = self.script(self.frame)
+        self.frame += 1
+        return actions
+
+
+class LiveControls:
+    def __init__(self, joysticks: list[pygame.joystick.Joystick]):
+        self.joysticks = joysticks
+
+    def change_joysticks(self, joysticks: list[pygame.joystick.Joystick]):
+        self.joysticks = joysticks
+
+    def get_actions(self) -> Actions:
+        if len(self.joysticks) == 0:
+            return read_keyboard()
+        return read_joystick(self.joysticks[0])
+
+
+def seed_argument(value: str) -> int:
+    # Command line seeds, which replay files store as unsigned 32 bit ints
+    seed = int(value)
+    if not 0 <= seed < 2 ** 32:
+        raise ArgumentTypeError(f'seed must be between 0 and {2 ** 32 - 1}')
+    return seed
+
+
+class Replay:
+    MAGIC = b'MVRP'
+    VERSION = 1
+    HEADER = struct.Struct('<4sBIdI')
+    FRAME = struct.Struct('<Bb')
+    AIMS = {None: 0, 'top': 1, 'bottom': 2}
+
+    def __init__(self, seed: int, dt: float, level_name: str, frames: list[Actions] = None):
+        self.seed = seed
+        self.dt = dt
+        self.level_name = level_name
+        self.frames = frames if frames is not None else []
+
+    def pack_frame(self, actions: Actions) -> bytes:
+        flags = actions.jump | actions.attack << 1 | actions.dash << 2 | self.AIMS[actions.aim] << 3
+        return self.FRAME.pack(flags, round(actions.move * 127))
+
+    def unpack_frame(self, flags: int, move: int) -> Actions:
+        aim = next(name for name, value in self.AIMS.items() if value == flags >> 3)
+        return Actions(move / 127, bool(flags & 1), bool(flags & 2), bool(flags & 4), aim)
+
+    def record(self, actions: Actions) -> Actions:
+        # The recorded session plays with the stored precision, so a replay matches it exactly
+        actions = self.unpack_frame(*self.FRAME.unpack(self.pack_frame(actions)))
+        self.frames.append(actions)
+        return actions
+
+    def save(self, path: Path):
+        name = self.level_name.encode()
+        header = self.HEADER.pack(self.MAGIC, self.VERSION, self.seed, self.dt, len(self.frames))
+        body = b''.join(self.pack_frame(actions) for actions in self.frames)
+        Path(path).write_bytes(header + bytes([len(name)]) + name + zlib.compress(body))
+
+    @classmethod
+    def load(cls, path: Path) -> 'Replay':
+        data = Path(path).read_bytes()
+        magic, version, seed, dt, frame_count = cls.HEADER.unpack_from(data)
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise ValueError(f'{path} is not a version {cls.VERSION} replay file')
+
+        offset = cls.HEADER.size
+        name_length = data[offset]
+        level_name = data[offset + 1:offset + 1 + name_length].decode()
+        body = zlib.decompress(data[offset + 1 + name_length:])
+
+        replay = cls(seed, dt, level_name)
+        replay.frames = [replay.unpack_frame(*frame) for frame in cls.FRAME.iter_unpack(body)][:frame_count]
+        return replay
+
+
+class InputRecorder:
+    def __init__(self, controls, replay: Replay):
+        self.controls = controls
+        self.replay = replay
+
+    def change_joysticks(self, joysticks: list[pygame.joystick.Joystick]):
+        if hasattr(self.controls, 'change_joysticks'):
+            self.controls.change_joysticks(joysticks)
+
+    def get_actions(self) -> Actions:
+        return self.replay.record(self.controls.get_actions())
+
+
+class ReplayControls:
+    def __init__(self, replay: Replay):
+        self.replay = replay
+        self.frame = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.frame >= len(self.replay.frames)
+
+    def get_actions(self) -> Actions:
+        if self.finished:
+            return Actions()
+        actions = self.replay.frames[self.frame]
+        self.frame += 1
+        return actions
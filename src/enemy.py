@@ -1,17 +1,26 @@
-from random import randint
-
 import pygame
 
 from src.player import Player
+from src.profiler import profiler
 from src.settings import BASE_DIR, LAYERS, TARGET_FPS
-from src.support import import_folder, wave_value
+from src.support import import_folder, wave_value, faded, rng
 from src.timer import Timer
 
 
+def patrol_catch_up(pos_x, speed, left, right, elapsed):
+    # Back and forth between the bounds, unfolded into a loop twice as long. The sides are picked by multiplying
+    # with the conditions, so the same code runs on single values and on the numpy arrays of an EnemyBatch
+    span = right - left
+    moving_right = speed > 0
+    offset = moving_right * (pos_x - left) + (1 - moving_right) * (2 * span - (pos_x - left))
+    offset = (offset + abs(speed) * elapsed) % (2 * span)
+    forward = offset < span
+    return forward * (left + offset) + (1 - forward) * (left + 2 * span - offset), abs(speed) * (2 * forward - 1)
+
+
 class Enemy(pygame.sprite.Sprite):
     def __init__(self, monster_name: str, pos: tuple[int, int], groups: list[pygame.sprite.Group],
                  collider_sprites: pygame.sprite.Group, create_particules):
-        super().__init__(groups)
         self.monster_name = monster_name
 
         # Animation
@@ -26,11 +35,17 @@ class Enemy(pygame.sprite.Sprite):
         # Setup
         self.image = self.animations[self.status][self.frame_index]
         self.rect = self.image.get_rect(topleft=pos)
+        self.old_rect = self.rect.copy()
         self.z = LAYERS['main']
+        super().__init__(groups)
 
         # Movement
         self.pos = pygame.math.Vector2(self.rect.topleft)
-        self.speed = randint(3, 5) * TARGET_FPS
+        self.speed = rng.randint(3, 5) * TARGET_FPS
+
+        # Activity, where the patrol turned going left and right, to catch up after sleeping
+        self.patrol_bounds = [None, None]
+        self.dormant_time = 0
 
         # Timers
         self.timers = {
@@ -61,10 +76,7 @@ class Enemy(pygame.sprite.Sprite):
 
         # hit
         if not self.vulnerable:
-            alpha = wave_value()
-            self.image.set_alpha(alpha)
-        else:
-            self.image.set_alpha(255)
+            self.image = faded(self.image, wave_value())
 
     def get_status(self):
         if self.speed > 0:
@@ -73,7 +85,9 @@ class Enemy(pygame.sprite.Sprite):
             self.status = 'left_run'
 
     def collision(self):
+        profiler.count('collision_tests', len(self.collider_sprites))
         if pygame.sprite.spritecollide(self, self.collider_sprites, False):
+            self.patrol_bounds[self.speed > 0] = self.pos.x
             self.speed *= -1
 
     def move(self, dt: float):
@@ -102,13 +116,50 @@ class Enemy(pygame.sprite.Sprite):
     def reset_vulnerability(self):
         self.vulnerable = True
 
-    def update_timers(self):
-        for timer in self.timers.values():  # type: Timer
-            timer.update()
+    def snapshot(self, origin: tuple[int, int]) -> dict:
+        return {
+            'alive': self.alive(), 'pos': [self.pos.x - origin[0], self.pos.y - origin[1]], 'speed': self.speed,
+            'health': self.health, 'vulnerable': self.vulnerable, 'frame_index': self.frame_index,
+            'patrol_bounds': [None if bound is None else bound - origin[0] for bound in self.patrol_bounds],
+            'dormant_time': self.dormant_time,
+            'timers': {name: timer.snapshot() for name, timer in self.timers.items()}
+        }
+
+    def restore(self, state: dict, origin: tuple[int, int]):
+        # Group membership is left to the level, alive only says whether the enemy should be in them
+        self.pos.update(state['pos'][0] + origin[0], state['pos'][1] + origin[1])
+        self.rect.topleft = (round(self.pos.x), round(self.pos.y))
+        self.old_rect = self.rect.copy()
+        self.speed = state['speed']
+        self.health = state['health']
+        self.vulnerable = state['vulnerable']
+        self.frame_index = state['frame_index']
+        self.patrol_bounds = [None if bound is None else bound + origin[0] for bound in state['patrol_bounds']]
+        self.dormant_time = state['dormant_time']
+        for name, remaining in state['timers'].items():
+            self.timers[name].restore(remaining)
+        self.get_status()
+        self.animate(0)
+
+    def sleep(self, dt: float):
+        self.dormant_time += dt
+
+    def catch_up(self, elapsed: float):
+        # The patrol skipped while asleep, once both turning points are known, the enemy stays put otherwise
+        left, right = self.patrol_bounds
+        if left is None or right is None or right <= left or not self.vulnerable:
+            return
+
+        self.pos.x, self.speed = patrol_catch_up(self.pos.x, self.speed, left, right, elapsed)
+        self.rect.x = round(self.pos.x)
 
     def update(self, dt: float):
+        if self.dormant_time:
+            self.catch_up(self.dormant_time)
+            self.dormant_time = 0
+
+        self.old_rect = self.rect.copy()
         self.get_status()
-        self.update_timers()
         self.check_death()
 
         self.move(dt)
@@ -0,0 +1,250 @@
+import pygame
+
+from src.clock import get_ticks
+from src.enemy import patrol_catch_up
+from src.player import Player
+from src.settings import BASE_DIR, LAYERS, TARGET_FPS
+from src.support import import_folder, wave_value, faded, rng
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INVULNERABILITY_DURATION = 350
+
+
+class BatchedEnemy(pygame.sprite.Sprite):
+    def __init__(self, batch: 'EnemyBatch', index: int, pos: tuple[int, int], groups: list[pygame.sprite.Group]):
+        # Setup
+        self.batch = batch
+        self.index = index
+        self.monster_name = batch.monster_name
+        self.image = batch.animations['right_run'][0]
+        self.rect = self.image.get_rect(topleft=pos)
+        self.old_rect = self.rect.copy()
+        self.z = LAYERS['main']
+        super().__init__(groups)
+
+    @property
+    def health(self) -> int:
+        self.batch.flush()
+        return int(self.batch.health[self.index])
+
+    @property
+    def vulnerable(self) -> bool:
+        self.batch.flush()
+        return bool(self.batch.invulnerable_until[self.index] <= get_ticks())
+
+    @property
+    def pos(self) -> pygame.math.Vector2:
+        self.batch.flush()
+        return pygame.math.Vector2(self.batch.pos_x[self.index], self.rect.y)
+
+    def get_damage(self, player: Player):
+        self.batch.damage(self.index, player.damage)
+
+    def snapshot(self, origin: tuple[int, int]) -> dict:
+        return self.batch.snapshot(self.index, origin)
+
+    def restore(self, state: dict, origin: tuple[int, int]):
+        self.batch.restore(self.index, state, origin)
+
+    def draw_debug(self, display_surface: pygame.Surface, offset: pygame.math.Vector2):
+        # draw rect
+        offset_rect = self.rect.copy()
+        offset_rect.topleft -= offset
+        pygame.draw.rect(display_surface, 'white', offset_rect, 3)
+
+
+class EnemyBatch:
+    def __init__(self, monster_name: str, create_particules):
+        self.monster_name = monster_name
+        self.create_particules = create_particules
+
+        # Animation, shared by every enemy of the batch
+        path = BASE_DIR / "graphics" / "enemies" / monster_name
+        self.animations = {
+            'right_run': import_folder(path / 'right_run'),
+            'left_run': import_folder(path / 'left_run')
+        }
+        self.speed_animation = 6
+
+        # Per enemy state
+        self.sprites = []
+        self.new_enemies = []
+        self.pos_x = np.zeros(0)
+        self.rect_x = np.zeros(0, dtype=np.int64)
+        self.rect_y = np.zeros(0, dtype=np.int64)
+        self.speed = np.zeros(0)
+        self.health = np.zeros(0, dtype=np.int64)
+        self.invulnerable_until = np.zeros(0)
+        self.frame_index = np.zeros(0)
+        self.alive = np.zeros(0, dtype=bool)
+
+        # Activity, where each patrol turned going left and right, to catch up after sleeping
+        self.patrol_bounds = np.zeros((0, 2))
+        self.dormant_time = np.zeros(0)
+
+        # Colliders, as left, top, right, bottom columns
+        self.colliders = np.zeros((0, 4), dtype=np.int64)
+
+    def add(self, pos: tuple[int, int], groups: list[pygame.sprite.Group]) -> BatchedEnemy:
+        sprite = BatchedEnemy(self, len(self.sprites), pos, groups)
+        self.sprites.append(sprite)
+        self.new_enemies.append((sprite.rect.x, sprite.rect.y, rng.randint(3, 5) * TARGET_FPS))
+        return sprite
+
+    def flush(self):
+        # New enemies are appended to the arrays in one go
+        if not self.new_enemies:
+            return
+        x, y, speed = np.array(self.new_enemies, dtype=np.float64).T
+        count = len(self.new_enemies)
+        self.new_enemies = []
+
+        self.pos_x = np.concatenate((self.pos_x, x))
+        self.rect_x = np.concatenate((self.rect_x, x.astype(np.int64)))
+        self.rect_y = np.concatenate((self.rect_y, y.astype(np.int64)))
+        self.speed = np.concatenate((self.speed, speed))
+        self.health = np.concatenate((self.health, np.full(count, 50)))
+        self.invulnerable_until = np.concatenate((self.invulnerable_until, np.zeros(count)))
+        self.frame_index = np.concatenate((self.frame_index, np.zeros(count)))
+        self.alive = np.concatenate((self.alive, np.ones(count, dtype=bool)))
+        self.patrol_bounds = np.concatenate((self.patrol_bounds, np.full((count, 2), np.nan)))
+        self.dormant_time = np.concatenate((self.dormant_time, np.zeros(count)))
+
+    def set_colliders(self, collider_sprites: pygame.sprite.Group):
+        self.colliders = np.array([(sprite.rect.left, sprite.rect.top, sprite.rect.right, sprite.rect.bottom)
+                                   for sprite in collider_sprites], dtype=np.int64).reshape(-1, 4)
+
+    def damage(self, index: int, amount: int):
+        self.flush()
+        current_time = get_ticks()
+        if self.invulnerable_until[index] <= current_time:
+            self.health[index] -= amount
+            self.invulnerable_until[index] = current_time + INVULNERABILITY_DURATION
+
+    def snapshot(self, index: int, origin: tuple[int, int]) -> dict:
+        # Same format as a per sprite Enemy, so snapshots work with either
+        self.flush()
+        current_time = get_ticks()
+        invulnerable_until = float(self.invulnerable_until[index])
+        return {
+            'alive': bool(self.alive[index]),
+            'pos': [float(self.pos_x[index]) - origin[0], int(self.rect_y[index]) - origin[1]],
+            'speed': float(self.speed[index]), 'health': int(self.health[index]),
+            'vulnerable': invulnerable_until <= current_time, 'frame_index': float(self.frame_index[index]),
+            'patrol_bounds': [None if np.isnan(bound) else float(bound) - origin[0]
+                              for bound in self.patrol_bounds[index]],
+            'dormant_time': float(self.dormant_time[index]),
+            'timers': {'invulnerability': None if invulnerable_until <= current_time
+                       else int(invulnerable_until) - current_time}
+        }
+
+    def restore(self, index: int, state: dict, origin: tuple[int, int]):
+        self.flush()
+        self.alive[index] = state['alive']
+        self.pos_x[index] = state['pos'][0] + origin[0]
+        self.rect_x[index] = round(self.pos_x[index])
+        self.rect_y[index] = round(state['pos'][1] + origin[1])
+        self.speed[index] = state['speed']
+        self.health[index] = state['health']
+        self.frame_index[index] = state['frame_index']
+        self.patrol_bounds[index] = [np.nan if bound is None else bound + origin[0] for bound in state['patrol_bounds']]
+        self.dormant_time[index] = state['dormant_time']
+        remaining = state['timers'].get('invulnerability')
+        self.invulnerable_until[index] = 0 if remaining is None else get_ticks() + remaining
+
+        sprite = self.sprites[index]
+        sprite.rect.topleft = (int(self.rect_x[index]), int(self.rect_y[index]))
+        sprite.old_rect = sprite.rect.copy()
+        frames = self.animations['right_run' if self.speed[index] > 0 else 'left_run']
+        sprite.image = frames[int(self.frame_index[index])]
+
+    def collisions(self, indices) -> 'np.ndarray':
+        width, height = self.sprites[0].rect.size
+        left = self.rect_x[indices, None]
+        top = self.rect_y[indices, None]
+        overlap = ((left < self.colliders[:, 2]) & (left + width > self.colliders[:, 0]) &
+                   (top < self.colliders[:, 3]) & (top + height > self.colliders[:, 1]))
+        return overlap.any(axis=1)
+
+    def catch_up(self, indices, vulnerable: 'np.ndarray'):
+        # Same catch up as a single Enemy, for the waking ones whose turning points are known
+        left, right = self.patrol_bounds[indices, 0], self.patrol_bounds[indices, 1]
+        known = ~np.isnan(left) & ~np.isnan(right) & (right > left) & vulnerable[indices]
+        indices, left, right = indices[known], left[known], right[known]
+
+        self.pos_x[indices], self.speed[indices] = patrol_catch_up(self.pos_x[indices], self.speed[indices], left,
+                                                                   right, self.dormant_time[indices])
+        self.rect_x[indices] = np.rint(self.pos_x[indices])
+        for index, x in zip(indices.tolist(), self.rect_x[indices].tolist()):
+            sprite = self.sprites[index]
+            sprite.rect.x = sprite.old_rect.x = x
+
+    def update(self, dt: float, active_rect: pygame.Rect) -> list[BatchedEnemy]:
+        # Returns the sprites that were updated, the others did not move
+        self.flush()
+        if not self.sprites:
+            return []
+        vulnerable = self.invulnerable_until <= get_ticks()
+
+        # Activity, enemies away from the player sleep and catch up when they wake
+        width, height = self.sprites[0].rect.size
+        active = self.alive & ((self.rect_x < active_rect.right) & (self.rect_x + width > active_rect.left) &
+                               (self.rect_y < active_rect.bottom) & (self.rect_y + height > active_rect.top))
+        self.dormant_time[self.alive & ~active] += dt
+        waking = np.flatnonzero(active & (self.dormant_time > 0))
+        if len(waking):
+            self.catch_up(waking, vulnerable)
+            self.dormant_time[waking] = 0
+
+        # Status, from the speed before this step's bounce
+        facing_right = self.speed > 0
+
+        # Death
+        for index in np.flatnonzero(active & (self.health <= 0)):
+            sprite = self.sprites[index]
+            self.create_particules(f'{self.monster_name}_death', sprite.rect.topleft)
+            sprite.kill()
+            self.alive[index] = False
+
+        # Patrol movement and collider bounce
+        moving = np.flatnonzero(active & vulnerable)
+        self.pos_x[moving] += self.speed[moving] * dt
+        self.rect_x[moving] = np.rint(self.pos_x[moving])
+        if len(moving) and len(self.colliders):
+            bounced = moving[self.collisions(moving)]
+            self.patrol_bounds[bounced, (self.speed[bounced] > 0).astype(np.int64)] = self.pos_x[bounced]
+            self.speed[bounced] *= -1
+
+        # Animation
+        self.frame_index[active] += self.speed_animation * dt
+        self.frame_index[self.frame_index >= len(self.animations['right_run'])] = 0
+
+        return self.sync(vulnerable, facing_right, active)
+
+    def sync(self, vulnerable: 'np.ndarray', facing_right: 'np.ndarray', active: 'np.ndarray') -> list[BatchedEnemy]:
+        # Copy the arrays back onto the sprites used for drawing and hit tests
+        right_frames = self.animations['right_run']
+        left_frames = self.animations['left_run']
+        alpha = wave_value()
+
+        rect_x = self.rect_x.tolist()
+        frame_index = self.frame_index.astype(np.int64).tolist()
+        vulnerable = vulnerable.tolist()
+        facing_right = facing_right.tolist()
+        sprites = [self.sprites[index] for index in np.flatnonzero(active).tolist()]
+        for sprite in sprites:
+            index = sprite.index
+            sprite.old_rect.x = sprite.rect.x
+            sprite.rect.x = rect_x[index]
+
+            frames = right_frames if facing_right[index] else left_frames
+            sprite.image = frames[frame_index[index]]
+
+            # hit
+            if not vulnerable[index]:
+                sprite.image = faded(sprite.image, alpha)
+        return sprites
@@ -1,47 +1,148 @@
 import sys
+from pathlib import Path
+from random import randrange
 
 import pygame
 
+from src.clock import SimulationClock, set_clock
+from src.controls import LiveControls, InputRecorder, Replay, ReplayControls
 from src.level import Level
-from src.settings import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, FULLSCREEN
+from src.map_cache import MapLoader
+from src.loading import AssetLoader, LoadingScreen, startup
+from src.profiler import profiler
+from src.settings import SCREEN_WIDTH, SCREEN_HEIGHT, FPS, FULLSCREEN, SIMULATION_FPS, MAX_FRAME_TIME, LOW_POWER, \
+    LOW_POWER_FPS, VSYNC, START_LEVEL
+from src.support import seed_random
 
 
 class Game:
-    def __init__(self):
+    def __init__(self, seed: int = None, record: Path = None, replay: Path = None, report_startup: bool = False):
         # Pygame setup
-        pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        if FULLSCREEN:
-            self.screen = pygame.display.set_mode((self.screen.get_width(), self.screen.get_height()),
-                                                  pygame.FULLSCREEN)
-        pygame.display.set_caption('Platformer')
+        with startup.phase('pygame init'):
+            pygame.init()
+            flags = pygame.SCALED if VSYNC else 0
+            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), flags, vsync=VSYNC)
+            if FULLSCREEN:
+                self.screen = pygame.display.set_mode((self.screen.get_width(), self.screen.get_height()),
+                                                      flags | pygame.FULLSCREEN, vsync=VSYNC)
+            pygame.display.set_caption('Platformer')
         self.clock = pygame.time.Clock()
+        self.report_startup = report_startup
+
+        # Fixed timestep
+        self.step_time = 1 / SIMULATION_FPS
+        self.accumulator = 0
+        self.simulation_clock = SimulationClock()
+        set_clock(self.simulation_clock)
+        self.focused = True
 
         # Joystick
         pygame.joystick.init()
         self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
 
-        self.level = Level(self.joysticks)
+        # Input recording and replay
+        controls = None
+        level_name = START_LEVEL
+        self.record_path = record
+        self.recording = None
+        if replay:
+            playback = Replay.load(replay)
+            seed = playback.seed
+            level_name = playback.level_name
+            self.step_time = playback.dt
+            controls = ReplayControls(playback)
+        elif record:
+            seed = randrange(2 ** 32) if seed is None else seed
+            self.recording = Replay(seed, self.step_time, '')
+            controls = InputRecorder(LiveControls(self.joysticks), self.recording)
+        seed_random(seed)
 
-    def run(self):
-        while True:
-            # FPS
-            dt = self.clock.tick(FPS) / 1000
+        map_loader = self.load_assets(level_name)
+        with startup.phase('level setup'):
+            self.level = Level(self.joysticks, controls, map_loader, level_name)
+        if self.recording:
+            self.recording.level_name = self.level.current_level
 
-            # Event
+    def load_assets(self, level_name: str) -> MapLoader:
+        # Images are decoded on worker threads while the main thread converts them and shows the progress
+        loader = AssetLoader(level_name)
+        loading_screen = LoadingScreen()
+        loader.start()
+        while not loader.done:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
-                    pygame.joystick.quit()
                     pygame.quit()
                     sys.exit()
+            loader.update()
+            loading_screen.draw(loader.progress)
+            pygame.display.update()
+            self.clock.tick(FPS)
+        return loader.map_loader
 
-                if event.type == pygame.JOYDEVICEADDED:
-                    self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
-                    self.level.change_joysticks(self.joysticks)
-                if event.type == pygame.JOYDEVICEREMOVED:
-                    self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
-                    self.level.change_joysticks(self.joysticks)
+    def frame_cap(self) -> int:
+        if LOW_POWER or not self.focused:
+            return LOW_POWER_FPS
+        return FPS
 
-            # Updates
-            self.level.run(dt)
-            pygame.display.update()
+    def step(self, frame_time: float) -> list[pygame.Rect]:
+        # Simulation runs at a fixed rate, whatever the framerate
+        self.accumulator += min(frame_time, MAX_FRAME_TIME)
+        while self.accumulator >= self.step_time:
+            dt = self.simulation_clock.advance(self.step_time)
+            if dt:
+                self.level.update(dt)
+            self.accumulator -= self.step_time
+
+        # Rendering is interpolated between the last two steps
+        return self.level.draw(self.accumulator / self.step_time)
+
+    def run(self):
+        # Saved however the loop ends, on quit but also on a crash
+        try:
+            while True:
+                # FPS
+                frame_time = self.clock.tick(self.frame_cap()) / 1000
+
+                # Event
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.joystick.quit()
+                        pygame.quit()
+                        sys.exit()
+
+                    if event.type == pygame.JOYDEVICEADDED:
+                        self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
+                        self.level.change_joysticks(self.joysticks)
+                    if event.type == pygame.JOYDEVICEREMOVED:
+                        self.joysticks = [pygame.joystick.Joystick(i) for i in range(pygame.joystick.get_count())]
+                        self.level.change_joysticks(self.joysticks)
+
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_p:
+                        self.simulation_clock.paused = not self.simulation_clock.paused
+
+                    # Profiler
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                        profiler.toggle()
+                    if event.type == pygame.KEYDOWN and event.key == pygame.K_F4 and profiler.frames:
+                        profiler.dump()
+
+                    if event.type == pygame.WINDOWFOCUSLOST:
+                        self.focused = False
+                    if event.type == pygame.WINDOWFOCUSGAINED:
+                        self.focused = True
+
+                # Updates
+                dirty_rects = self.step(frame_time)
+                if dirty_rects is None:
+                    pygame.display.update()
+                else:
+                    pygame.display.update(dirty_rects)
+
+                # Startup time, up to the first frame on screen
+                if self.report_startup:
+                    print(startup.report())
+                    self.report_startup = False
+                profiler.end_frame()
+        finally:
+            if self.recording:
+                self.recording.save(self.record_path)
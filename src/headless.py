@@ -0,0 +1,86 @@
+import os
+import time
+from hashlib import sha1
+from argparse import ArgumentParser
+
+import pygame
+
+from src.clock import SimulationClock, set_clock
+from src.controls import Replay, ReplayControls
+from src.level import Level
+from src.profiler import profiler
+from src.settings import SCREEN_WIDTH, SCREEN_HEIGHT, SIMULATION_FPS, START_LEVEL
+from src.support import seed_random
+from src.timer import scheduler
+
+
+class Simulation:
+    def __init__(self, seed: int = 0, dt: float = 1 / SIMULATION_FPS, render: bool = False, controls=None,
+                 level_name: str = START_LEVEL):
+        # Pygame setup, without a window
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        pygame.init()
+        pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+
+        # Determinism
+        self.dt = dt
+        self.render = render
+        self.clock = SimulationClock()
+        set_clock(self.clock)
+        scheduler.clear()
+        seed_random(seed)
+
+        self.level = Level([], controls, level_name=level_name)
+        self.frame = 0
+
+    def step(self):
+        dt = self.clock.advance(self.dt)
+        if self.render:
+            self.level.draw()
+        if dt:
+            self.level.update(dt)
+        self.frame += 1
+        profiler.end_frame()
+
+    def run(self, frames: int):
+        for _ in range(frames):
+            self.step()
+
+    def run_replay(self):
+        while not self.level.controls.finished:
+            self.step()
+
+    def state_digest(self) -> str:
+        player = self.level.player
+        state = [self.level.current_level, self.clock.get_ticks(), player.pos.x, player.pos.y, player.health,
+                 player.status]
+        for enemy in self.level.enemy_sprites:
+            state += [enemy.pos.x, enemy.pos.y, enemy.health]
+        return sha1(repr(state).encode()).hexdigest()
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Run the level without a window, as fast as possible.')
+    parser.add_argument('--frames', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--render', action='store_true')
+    parser.add_argument('--replay', help='play back a replay file instead of running idle')
+    args = parser.parse_args()
+
+    if args.replay:
+        replay = Replay.load(args.replay)
+        simulation = Simulation(replay.seed, replay.dt, args.render, ReplayControls(replay), replay.level_name)
+        start = time.perf_counter()
+        simulation.run_replay()
+    else:
+        simulation = Simulation(args.seed, render=args.render)
+        start = time.perf_counter()
+        simulation.run(args.frames)
+    elapsed = time.perf_counter() - start
+    frames = simulation.frame
+
+    player = simulation.level.player
+    print(f'{frames} frames in {elapsed:.3f}s ({frames / elapsed:.0f} frames/s)')
+    print(f'level: {simulation.level.current_level}, player: {player.rect.topleft}, health: {player.health}')
+    print(f'state: {simulation.state_digest()}')
@@ -1,36 +1,63 @@
 import pygame
-from pytmx import load_pygame
 
 from src.UI import UI
 from src.camera import CameraGroup
+from src.chunk import StaticLayer
 from src.enemy import Enemy
+from src.enemy_batch import EnemyBatch, np
 from src.level_data import LEVELS
+from src.map_cache import MapLoader
 from src.particule import ParticuleManager
 from src.player import Player
-from src.settings import TILE_SIZE, BG_COLOR, BASE_DIR, DEBUG, LAYERS
+from src.profiler import profiler
+from src.settings import BG_COLOR, BASE_DIR, DEBUG, LAYERS, BAKE_STATIC_LAYERS, BATCH_ENEMIES, DIRTY_RECTS, \
+    START_LEVEL, ROOM_BUILD_BUDGET, ACTIVITY_MARGIN
+from src.spatial import SpatialGroup
 from src.support import import_folder
-from src.tile import Tile, AnimatedTile, ExitTile, Checkpoint
-from src.timer import Timer
+from src.tile import Tile, Animation, ExitTile, Checkpoint
+from src.tilemap import TileMapGroup
+from src.timer import Timer, scheduler
 from src.transition import Transition
 from src.weapon import Weapon
+from src.world import World, Room
 
 
 class Level:
-    def __init__(self, joysticks: list[pygame.joystick.Joystick]):
+    def __init__(self, joysticks: list[pygame.joystick.Joystick], controls=None, map_loader: MapLoader = None,
+                 level_name: str = START_LEVEL):
         # Setup
         self.display_surface = pygame.display.get_surface()
         self.joysticks = joysticks
+        self.controls = controls
 
         # Groups
         self.all_sprites = CameraGroup()
-        self.collision_sprites = pygame.sprite.Group()
-        self.collider_sprites = pygame.sprite.Group()
-        self.enemy_sprites = pygame.sprite.Group()
-        self.checkpoint_sprites = pygame.sprite.Group()
-        self.exit_sprites = pygame.sprite.Group()
+        self.dynamic_sprites = pygame.sprite.Group()
+        self.enemy_sprites = SpatialGroup()
+        self.checkpoint_sprites = SpatialGroup()
+        self.exit_sprites = SpatialGroup()
         self.last_checkpoint = None
+        self.touched_checkpoint = None
+        self.checkpoint_snapshot = None
+        self.entry_snapshot = None
         self.current_attack = None
 
+        # Tile maps, the terrain is what the player collides with
+        self.terrain = TileMapGroup()
+        self.water = TileMapGroup()
+        self.all_sprites.add_renderer(LAYERS['water'], self.water)
+        if not BAKE_STATIC_LAYERS:
+            self.all_sprites.add_renderer(LAYERS['terrain'], self.terrain)
+
+        # Particules
+        self.particule_manager = ParticuleManager()
+        self.all_sprites.add_renderer(LAYERS['particules'], self.particule_manager)
+
+        # Animations shared by every tile that plays them
+        self.animations = {
+            'water': Animation(import_folder(BASE_DIR / "graphics" / "water"), alpha=150)
+        }
+
         # Timers
         self.timers = {
             'screen shake': Timer(300, self.stop_screen_shake),
@@ -41,76 +68,115 @@ class Level:
         self.screen_shake = False
 
         # Player
-        self.player = Player((128, 576), self.all_sprites, self.collision_sprites, self.create_attack,
-                             self.destroy_attack, self.create_particules, self.joysticks)
+        self.player = Player((128, 576), [self.all_sprites, self.dynamic_sprites], self.terrain,
+                             self.create_attack,
+                             self.destroy_attack, self.create_particules, self.joysticks, self.controls)
         self.respawn = False
 
         # Map
-        self.current_level = 'map_test'
+        self.map_loader = map_loader or MapLoader()
+        self.world = World(self.map_loader, self.build_room)
+        self.current_level = level_name
         self.load_map(self.current_level)
 
         # User interface
         self.ui = UI()
 
-        # Particules
-        self.particule_manager = ParticuleManager()
-
         # Transition
         self.transition = Transition(self.reset_player, self.stop_respawn)
 
     def load_map(self, level_name, x: int = None, y: int = None):
         self.clear_map()
-        tmx_data = load_pygame(f'data/{level_name}.tmx')
+        room = self.world.enter(level_name)
         self.current_level = level_name
 
         if x and y:
-            self.player.pos.x = x
-            self.player.pos.y = y
-
-        # Terrain
-        for x, y, surf in tmx_data.get_layer_by_name('Terrain').tiles():
-            Tile((x * TILE_SIZE, y * TILE_SIZE), [self.all_sprites, self.collision_sprites], surf, LAYERS['terrain'])
-
-        # Water
-        water_frames = import_folder(BASE_DIR / "graphics" / "water")
-        for x, y, surf in tmx_data.get_layer_by_name('Water').tiles():
-            AnimatedTile((x * TILE_SIZE, y * TILE_SIZE), water_frames, [self.all_sprites], z=LAYERS['water'], alpha=150)
+            self.place_player(room.to_world(x, y))
+        self.entry_snapshot = self.snapshot()
+
+    def place_player(self, pos: tuple[float, float]):
+        self.player.pos.x, self.player.pos.y = pos
+        self.player.rect.topleft = pos
+        self.player.old_rect = self.player.rect.copy()
+
+    def build_room(self, room: Room):
+        # Generator, yields the cost of each piece so the world streamer can spread the room over several steps
+        map_data = room.map_data
+
+        # Terrain, drawn by the tile map itself unless it is baked into chunks
+        terrain = map_data.tile_map('Terrain', room.origin)
+        terrain.build_colliders()
+        room.tile_maps.append(terrain)
+        self.terrain.add(terrain)
+        yield ROOM_BUILD_BUDGET
+        if BAKE_STATIC_LAYERS:
+            layer = StaticLayer(terrain, [self.all_sprites], LAYERS['terrain'])
+            room.static_layers.append(layer)
+            for col, row, gid in terrain.cells():
+                chunk_count = len(layer.chunks)
+                layer.tile_changed(col, row)
+                yield ROOM_BUILD_BUDGET if len(layer.chunks) > chunk_count else 1
+
+        # Water, every cell plays the shared animation
+        water = map_data.tile_map('Water', room.origin, [self.animations['water']] * len(map_data.tileset))
+        room.tile_maps.append(water)
+        self.water.add(water)
+        yield 1
 
         # Enemies
-        for obj in tmx_data.get_layer_by_name('Enemies'):
+        for obj in map_data.objects('Enemies'):
+            pos = room.to_world(obj.x, obj.y)
             if obj.name == 'Collider':
-                Tile((obj.x, obj.y), [self.collider_sprites], z=LAYERS['invisible'])
+                room.sprites.append(Tile(pos, [room.collider_sprites], z=LAYERS['invisible']))
             if obj.type == 'Enemy':
-                Enemy(obj.name, (obj.x, obj.y), [self.all_sprites, self.enemy_sprites], self.collider_sprites,
-                      self.create_particules)
+                if BATCH_ENEMIES and np is not None:
+                    enemy = self.get_enemy_batch(room, obj.name).add(pos, self.enemy_groups(True))
+                else:
+                    enemy = Enemy(obj.name, pos, self.enemy_groups(False), room.collider_sprites,
+                                  self.create_particules)
+                room.sprites.append(enemy)
+                room.enemies.append(enemy)
+            yield 1
+        for batch in room.enemy_batches.values():  # type: EnemyBatch
+            batch.set_colliders(room.collider_sprites)
 
         # Interaction
-        for obj in tmx_data.get_layer_by_name('Interaction'):
+        for obj in map_data.objects('Interaction'):
             if obj.name == 'Checkpoint':
-                Checkpoint(self.current_level, (obj.x, obj.y), [self.checkpoint_sprites])
+                room.sprites.append(Checkpoint(room.name, room.to_world(obj.x, obj.y), [self.checkpoint_sprites]))
 
         # Exit
-        for obj in tmx_data.get_layer_by_name('Exit'):
-            ExitTile(self.current_level, obj.name, (obj.x, obj.y), obj.width, obj.height,
-                     [self.all_sprites, self.exit_sprites])
+        for obj in map_data.objects('Exit'):
+            exit_sprite = ExitTile(room.name, obj.name, room.to_world(obj.x, obj.y), obj.width, obj.height,
+                                   [self.all_sprites, self.exit_sprites])
+            room.sprites.append(exit_sprite)
+            room.exits.append(exit_sprite)
+
+    def enemy_groups(self, batched: bool) -> list[pygame.sprite.Group]:
+        # Batched enemies are updated by their batch, not as dynamic sprites
+        if batched:
+            return [self.all_sprites, self.enemy_sprites]
+        return [self.all_sprites, self.dynamic_sprites, self.enemy_sprites]
+
+    def get_enemy_batch(self, room: Room, monster_name: str) -> EnemyBatch:
+        if monster_name not in room.enemy_batches:
+            room.enemy_batches[monster_name] = EnemyBatch(monster_name, self.create_particules)
+        return room.enemy_batches[monster_name]
 
     def change_joysticks(self, joysticks: list[pygame.joystick.Joystick]):
         self.joysticks = joysticks
         self.player.change_joysticks(self.joysticks)
+        if hasattr(self.controls, 'change_joysticks'):
+            self.controls.change_joysticks(self.joysticks)
 
     def clear_map(self):
-        # Groups
-        self.all_sprites.empty()
-        self.collision_sprites.empty()
-        self.collider_sprites.empty()
-        self.enemy_sprites.empty()
-        self.checkpoint_sprites.empty()
-        self.exit_sprites.empty()
+        self.world.reset()
+        self.particule_manager.clear()
         if self.current_attack:
             self.current_attack.kill()
 
     def create_attack(self, direction: str):
-        self.current_attack = Weapon(self.player, direction, [self.all_sprites])
+        self.current_attack = Weapon(self.player, direction, [self.all_sprites, self.dynamic_sprites])
 
     def destroy_attack(self):
         if self.current_attack:
@@ -119,14 +185,15 @@ class Level:
 
     def player_attack_logic(self):
         if self.current_attack:
-            collision_sprites = pygame.sprite.spritecollide(self.current_attack, self.enemy_sprites, False)
+            collision_sprites = self.enemy_sprites.collide(self.current_attack.rect)
             if collision_sprites:
                 for target_sprite in collision_sprites:  # type: Enemy
                     target_sprite.get_damage(self.player)
 
     def damage_player(self):
-        if self.player.vulnerable:
-            collision_sprites = pygame.sprite.spritecollide(self.player, self.enemy_sprites, False)
+        # A dead player's timers still run, so it must not be hit again while waiting to respawn
+        if self.player.vulnerable and self.player.alive():
+            collision_sprites = self.enemy_sprites.collide(self.player.rect)
             if collision_sprites:
                 for _ in collision_sprites:
                     self.player.health -= 1
@@ -136,17 +203,68 @@ class Level:
                     self.timers['screen shake'].activate()
 
                     if self.player.health <= 0:
-                        self.particule_manager.create_particules('player_death', self.player.rect.topleft,
-                                                                 self.all_sprites)
+                        self.particule_manager.create_particules('player_death', self.player.rect.topleft)
                         self.player.kill()
                         self.timers['player death'].activate()
+                        break
+
+    def snapshot(self) -> dict:
+        # Plain values only, positions relative to their room, so a snapshot can also be saved to a file
+        room = self.world.current
+        checkpoint = self.last_checkpoint
+        return {
+            'level': room.name,
+            'checkpoint': checkpoint and [checkpoint.level_name, checkpoint.rect.x - room.origin[0],
+                                          checkpoint.rect.y - room.origin[1]],
+            'player': self.player.snapshot(room.origin),
+            'timers': {name: timer.snapshot() for name, timer in self.timers.items()},
+            'camera': self.all_sprites.snapshot(room.origin),
+            'rooms': {name: [enemy.snapshot(resident.origin) for enemy in resident.enemies]
+                      for name, resident in self.world.rooms.items()}
+        }
+
+    def restore(self, snapshot: dict):
+        # In place, rooms that were not resident then are built again from their map when needed
+        self.destroy_attack()
+        self.particule_manager.clear()
+        room = self.world.enter(snapshot['level'])
+        self.current_level = room.name
+        for name in [name for name in self.world.rooms if name not in snapshot['rooms']]:
+            self.world.unload(name)
+
+        # Enemies
+        for name, states in snapshot['rooms'].items():
+            resident = self.world.rooms.get(name)
+            if resident is None:
+                continue
+            self.world.finish(resident)
+            for enemy, state in zip(resident.enemies, states):
+                enemy.restore(state, resident.origin)
+                if state['alive'] and not enemy.alive():
+                    enemy.add(self.enemy_groups(hasattr(enemy, 'batch')))
+                elif not state['alive'] and enemy.alive():
+                    enemy.kill()
+        self.enemy_sprites.refresh()
+
+        # Checkpoint, in the current room when the snapshot was taken on it
+        if snapshot['checkpoint']:
+            level_name, x, y = snapshot['checkpoint']
+            for checkpoint in self.checkpoint_sprites:
+                if checkpoint.level_name == level_name and checkpoint.rect.topleft == room.to_world(x, y):
+                    self.last_checkpoint = self.touched_checkpoint = checkpoint
+
+        # Player, timers and camera
+        self.player.restore(snapshot['player'], room.origin)
+        if not self.player.alive():
+            self.player.add(self.all_sprites, self.dynamic_sprites)
+        for name, remaining in snapshot['timers'].items():
+            self.timers[name].restore(remaining)
+        self.screen_shake = self.timers['screen shake'].active
+        self.all_sprites.restore(snapshot['camera'], room.origin)
 
     def reset_player(self):
-        self.load_map(self.last_checkpoint.level_name)
-        x = self.last_checkpoint.rect.x
-        y = self.last_checkpoint.rect.y
-        self.player = Player((x, y), self.all_sprites, self.collision_sprites, self.create_attack,
-                             self.destroy_attack, self.create_particules, self.joysticks)
+        # From the snapshot taken at the last checkpoint, or where the player entered the room before reaching one
+        self.restore(self.checkpoint_snapshot or self.entry_snapshot)
 
     def stop_respawn(self):
         self.respawn = False
@@ -155,46 +273,101 @@ class Level:
         self.respawn = True
 
     def checkpoint_collision(self):
-        collision_sprites = pygame.sprite.spritecollide(self.player, self.checkpoint_sprites, False)
-        if collision_sprites:
-            for checkpoint in collision_sprites:  # type: Tile
-                self.last_checkpoint = checkpoint
+        collision_sprites = self.checkpoint_sprites.collide(self.player.rect, ordered=True)
+        checkpoint = collision_sprites[-1] if collision_sprites else None  # type: Checkpoint
+        if checkpoint is not None and checkpoint is not self.touched_checkpoint and self.player.alive():
+            self.last_checkpoint = checkpoint
+            self.checkpoint_snapshot = self.snapshot()
+        self.touched_checkpoint = checkpoint
 
     def exit_collision(self):
-        collision_sprites = pygame.sprite.spritecollide(self.player, self.exit_sprites, False)
+        collision_sprites = self.exit_sprites.collide(self.player.rect, ordered=True)
         if collision_sprites:
-            for exit_sprite in collision_sprites:  # type: ExitTile
-                x = LEVELS[exit_sprite.new_level][exit_sprite.current_level][0]
-                y = LEVELS[exit_sprite.new_level][exit_sprite.current_level][1]
-                self.load_map(exit_sprite.new_level, x, y)
+            # The next room is already resident, or finished building now, so the player only moves across
+            exit_sprite = collision_sprites[0]  # type: ExitTile
+            room = self.world.enter(exit_sprite.new_level)
+            self.current_level = room.name
+            self.place_player(room.to_world(*LEVELS[room.name][exit_sprite.current_level]))
+            if self.player.alive():
+                self.entry_snapshot = self.snapshot()
 
     def create_particules(self, animation_type: str, pos: tuple[int, int]):
-        self.particule_manager.create_particules(animation_type, pos, self.all_sprites)
+        self.particule_manager.create_particules(animation_type, pos)
 
     def stop_screen_shake(self):
         self.screen_shake = False
 
     def update_timers(self):
-        for timer in self.timers.values():  # type: Timer
-            timer.update()
-
-    def run(self, dt: float):
-        # Drawing logic
-        self.display_surface.fill(BG_COLOR)
-        self.all_sprites.custom_draw(self.player, self.screen_shake)
-        self.ui.draw(self.player)
+        scheduler.update()
+
+    def draw(self, alpha: float = 1) -> list[pygame.Rect]:
+        # Overlays cover the whole screen, so they always get a full redraw
+        redraw = update = None
+        with profiler.phase('ui'):
+            hud_changes = self.ui.update(self.player)
+        with profiler.phase('draw'):
+            if DIRTY_RECTS and not (DEBUG or self.respawn or profiler.enabled):
+                redraw, update = self.all_sprites.draw_dirty(self.player, self.screen_shake, alpha, [self.ui.rect],
+                                                             hud_changes)
+            else:
+                self.display_surface.fill(BG_COLOR)
+                self.all_sprites.custom_draw(self.player, self.screen_shake, alpha)
+        with profiler.phase('ui'):
+            self.ui.draw(redraw)
 
         # Debug
         if DEBUG:
             self.all_sprites.draw_debug()
 
-        # Update logic
-        self.all_sprites.update(dt)
-        self.update_timers()
-        self.damage_player()
-        self.player_attack_logic()
-        self.checkpoint_collision()
-        self.exit_collision()
+        if self.respawn:
+            with profiler.phase('transition'):
+                self.transition.draw()
+
+        profiler.draw(self.display_surface)
+        return update
+
+    def activity_rect(self) -> pygame.Rect:
+        # Around the player rather than the camera, so rendering never changes the simulation
+        return self.display_surface.get_rect(center=self.player.rect.center).inflate(ACTIVITY_MARGIN * 2,
+                                                                                      ACTIVITY_MARGIN * 2)
+
+    def update_sprites(self, dt: float):
+        # Only what is near the player moves, the rest sleeps until it comes back into range
+        active_rect = self.activity_rect()
+        moved = []
+        for sprite in self.dynamic_sprites.sprites():
+            if sprite.rect.colliderect(active_rect) or not hasattr(sprite, 'sleep'):
+                sprite.update(dt)
+                moved.append(sprite)
+            else:
+                sprite.sleep(dt)
+        for batch in self.world.enemy_batches():  # type: EnemyBatch
+            moved.extend(batch.update(dt, active_rect))
+        profiler.gauge('active_sprites', len(moved))
+
+        # Enemies that moved into other cells of the grid
+        self.enemy_sprites.refresh(moved)
+
+    def update(self, dt: float):
+        profiler.gauge('sprites', len(self.all_sprites))
+        with profiler.phase('timers'):
+            self.update_timers()
+        with profiler.phase('world'):
+            self.world.update(self.player.rect)
+        with profiler.phase('sprites'):
+            for animation in self.animations.values():
+                animation.update(dt)
+            self.update_sprites(dt)
+            self.particule_manager.update(dt)
+        with profiler.phase('damage_player'):
+            self.damage_player()
+        with profiler.phase('player_attack_logic'):
+            self.player_attack_logic()
+        with profiler.phase('checkpoint_collision'):
+            self.checkpoint_collision()
+        with profiler.phase('exit_collision'):
+            self.exit_collision()
 
         if self.respawn:
-            self.transition.play(dt)
+            with profiler.phase('transition'):
+                self.transition.update(dt)
@@ -0,0 +1,130 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pygame
+
+from src.atlas import GRAPHICS_DIR, asset_groups, atlases
+from src.map_cache import MapLoader, CompiledMap, read_map
+from src.profiler import Phase
+from src.settings import USE_ATLASES, BG_COLOR, START_LEVEL
+from src.support import assets
+
+
+class StartupTimings:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = {}
+
+    def phase(self, name: str) -> Phase:
+        return Phase(self, name)
+
+    def record(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0) + seconds * 1000
+
+    def report(self) -> str:
+        lines = [f'{name:<16}{duration:9.1f} ms' for name, duration in self.phases.items()]
+        lines.append(f"{'total':<16}{(time.perf_counter() - self.start) * 1000:9.1f} ms")
+        return '\n'.join(lines)
+
+
+startup = StartupTimings()
+
+
+def decode_group(name: str, sources: list[Path]) -> tuple:
+    # Worker thread, reads and decodes without touching the display
+    start = time.perf_counter()
+    if USE_ATLASES:
+        decoded = atlases.read(name, sources)
+    else:
+        decoded = {source: pygame.image.load(source) for source in sources}
+    return name, decoded, time.perf_counter() - start
+
+
+def parse_map(level_name: str) -> tuple:
+    start = time.perf_counter()
+    data = read_map(level_name)
+    return level_name, data, time.perf_counter() - start
+
+
+class AssetLoader:
+    def __init__(self, level_name: str = START_LEVEL):
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='asset-loader')
+        self.map_loader = MapLoader()
+        self.level_name = level_name
+        self.asset_jobs = []
+        self.map_job = None
+        self.total = 0
+
+    def start(self):
+        self.asset_jobs = [self.executor.submit(decode_group, name, sources)
+                           for name, sources in asset_groups().items()]
+        self.map_job = self.executor.submit(parse_map, self.level_name)
+        self.total = len(self.asset_jobs) + 1
+
+    @property
+    def done(self) -> bool:
+        return not self.asset_jobs and self.map_job is None
+
+    @property
+    def progress(self) -> float:
+        remaining = len(self.asset_jobs) + (self.map_job is not None)
+        return 1 - remaining / self.total if self.total else 1
+
+    def store(self, name: str, decoded):
+        # Main thread, converts to the display format and fills the asset cache
+        if USE_ATLASES:
+            atlas = atlases.add(name, *decoded)
+            for key in atlas.folders:
+                assets.store(GRAPHICS_DIR / key, atlas.get_folder(key))
+            for key in atlas.images:
+                assets.store(GRAPHICS_DIR / key, atlas.get_image(key))
+            return
+
+        images = {source: image.convert_alpha() for source, image in decoded.items()}
+        folders = {}
+        for source in sorted(images, key=lambda path: path.name):
+            assets.store(source, images[source])
+            if source.parent != GRAPHICS_DIR:
+                folders.setdefault(source.parent, []).append(images[source])
+        for folder, frames in folders.items():
+            assets.store(folder, frames)
+
+    def update(self):
+        for job in [job for job in self.asset_jobs if job.done()]:
+            self.asset_jobs.remove(job)
+            name, decoded, seconds = job.result()
+            startup.record('asset decode', seconds)
+            with startup.phase('asset convert'):
+                self.store(name, decoded)
+
+        if self.map_job is not None and self.map_job.done():
+            level_name, data, seconds = self.map_job.result()
+            self.map_job = None
+            startup.record('map parse', seconds)
+            with startup.phase('map convert'):
+                self.map_loader.maps[level_name] = CompiledMap(data)
+
+        if self.done:
+            self.executor.shutdown(wait=False)
+
+
+class LoadingScreen:
+    def __init__(self):
+        self.display_surface = pygame.display.get_surface()
+        self.font = pygame.font.Font(None, 36)
+
+    def draw(self, progress: float):
+        self.display_surface.fill(BG_COLOR)
+        width, height = self.display_surface.get_size()
+
+        # Progress bar
+        bar_rect = pygame.Rect(0, 0, width // 3, 16)
+        bar_rect.center = (width // 2, height // 2)
+        fill_rect = bar_rect.copy()
+        fill_rect.width = int(bar_rect.width * progress)
+        pygame.draw.rect(self.display_surface, 'white', fill_rect)
+        pygame.draw.rect(self.display_surface, 'white', bar_rect, 2)
+
+        text_surf = self.font.render('Loading', True, 'white')
+        self.display_surface.blit(text_surf, text_surf.get_rect(midbottom=(width // 2, bar_rect.top - 12)))
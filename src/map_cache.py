@@ -0,0 +1,169 @@
+import os
+import pickle
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pygame
+import pytmx
+from pytmx.util_pygame import handle_transformation, smart_convert
+
+from src.atlas import write_atomic
+from src.level_data import LEVELS
+from src.settings import BASE_DIR, MAP_CACHE_DIR, PRELOAD_ADJACENT_MAPS
+from src.tilemap import TileMap
+
+CACHE_VERSION = 2
+
+
+class MapObject:
+    def __init__(self, id: int, name: str, type: str, x: float, y: float, width: float, height: float):
+        self.id = id
+        self.name = name
+        self.type = type
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class CompiledMap:
+    def __init__(self, data: dict):
+        self.width = data['width']
+        self.height = data['height']
+        self.layers = data['layers']
+        self.object_groups = {name: [MapObject(**obj) for obj in objects]
+                              for name, objects in data['objects'].items()}
+
+        # Tile surfaces are converted on the main thread
+        self.images = {}
+        for gid, (size, pixels, colorkey) in data['images'].items():
+            surf = pygame.image.frombytes(pixels, size, 'RGBA')
+            self.images[gid] = smart_convert(surf, colorkey and pygame.Color(f'#{colorkey}'), True)
+
+        # Surface table indexed by gid, shared by the tile maps of every layer
+        self.tileset = [None] * (max(self.images, default=0) + 1)
+        for gid, surf in self.images.items():
+            self.tileset[gid] = surf
+
+    def tile_map(self, layer_name: str, origin: tuple[int, int], tileset: list = None) -> TileMap:
+        tile_map = TileMap(origin, self.width, self.height, self.tileset if tileset is None else tileset)
+        for x, y, gid in self.layers.get(layer_name, []):
+            tile_map.set_tile(x, y, gid)
+        return tile_map
+
+    def objects(self, layer_name: str) -> list[MapObject]:
+        return self.object_groups.get(layer_name, [])
+
+
+def raw_image_loader(filename: str, colorkey, **kwargs):
+    image = pygame.image.load(filename)
+
+    def load_image(rect=None, flags=None):
+        tile = image.subsurface(rect) if rect else image.copy()
+        if flags:
+            tile = handle_transformation(tile, flags)
+        return tile.get_size(), pygame.image.tobytes(tile, 'RGBA'), colorkey
+
+    return load_image
+
+
+def map_sources(path: Path) -> list[Path]:
+    # The tmx file, the tsx files it references and every image either of them uses
+    sources = {path: None}
+    pending = [path]
+    while pending:
+        document = pending.pop()
+        for element in ElementTree.parse(document).getroot().iter():
+            if element.tag in ('tileset', 'image') and element.get('source'):
+                source = Path(os.path.normpath(document.parent / element.get('source')))
+                if source not in sources:
+                    sources[source] = None
+                    if source.suffix == '.tsx':
+                        pending.append(source)
+    return list(sources)
+
+
+def source_mtimes(sources: list[Path]) -> dict[str, int]:
+    return {Path(os.path.relpath(source, BASE_DIR)).as_posix(): source.stat().st_mtime_ns for source in sources}
+
+
+def cache_valid(data: dict) -> bool:
+    # Still compiled from the current files, the map and the tilesets and images it uses
+    try:
+        return data['version'] == CACHE_VERSION and all((BASE_DIR / key).stat().st_mtime_ns == mtime
+                                                        for key, mtime in data['sources'].items())
+    except (OSError, KeyError):
+        return False
+
+
+def compile_map(path: Path) -> dict:
+    tmx_data = pytmx.TiledMap(str(path), image_loader=raw_image_loader)
+
+    layers = {}
+    objects = {}
+    used_gids = set()
+    for layer in tmx_data.layers:
+        if isinstance(layer, pytmx.TiledTileLayer):
+            layers[layer.name] = [(x, y, gid) for x, y, gid in layer.iter_data() if gid]
+            used_gids.update(gid for _, __, gid in layers[layer.name])
+        elif isinstance(layer, pytmx.TiledObjectGroup):
+            objects[layer.name] = [{
+                'id': obj.id, 'name': obj.name, 'type': obj.type,
+                'x': obj.x, 'y': obj.y, 'width': obj.width, 'height': obj.height
+            } for obj in layer]
+
+    return {
+        'version': CACHE_VERSION,
+        'sources': source_mtimes(map_sources(path)),
+        'width': tmx_data.width,
+        'height': tmx_data.height,
+        'layers': layers,
+        'objects': objects,
+        'images': {gid: tmx_data.images[gid] for gid in used_gids if tmx_data.images[gid]}
+    }
+
+
+def read_map(level_name: str) -> dict:
+    path = BASE_DIR / 'data' / f'{level_name}.tmx'
+    cache_path = MAP_CACHE_DIR / f'{level_name}.mapc'
+
+    # Compiled map, valid as long as none of the files it was compiled from changed
+    if cache_path.exists():
+        try:
+            data = pickle.loads(zlib.decompress(cache_path.read_bytes()))
+            if cache_valid(data):
+                return data
+        except (pickle.UnpicklingError, zlib.error, EOFError):
+            pass
+
+    data = compile_map(path)
+    MAP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    write_atomic(cache_path, zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+    return data
+
+
+class MapLoader:
+    def __init__(self):
+        self.maps = {}
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='map-loader')
+
+    def prefetch(self, level_name: str):
+        if level_name not in self.maps and level_name not in self.pending:
+            self.pending[level_name] = self.executor.submit(read_map, level_name)
+
+    def prefetch_neighbours(self, level_name: str):
+        for neighbour in LEVELS.get(level_name, {}):
+            self.prefetch(neighbour)
+
+    def load(self, level_name: str) -> CompiledMap:
+        if level_name not in self.maps:
+            future = self.pending.pop(level_name, None)
+            data = future.result() if future else read_map(level_name)
+            self.maps[level_name] = CompiledMap(data)
+
+        if PRELOAD_ADJACENT_MAPS:
+            self.prefetch_neighbours(level_name)
+        return self.maps[level_name]
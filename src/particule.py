@@ -1,43 +1,84 @@
 import pygame
 
-from src.settings import TARGET_FPS, BASE_DIR, LAYERS
-from src.support import import_folder
+from src.settings import TARGET_FPS, BASE_DIR, PARTICULE_POOL_SIZE
+from src.support import import_folder, effects_rng
 
 
-class ParticuleManager:
+class Particule:
+    __slots__ = ('frames', 'frame_index', 'x', 'y', 'velocity_x', 'velocity_y')
+
     def __init__(self):
-        self.frames = {
-            'before_jump': import_folder(BASE_DIR / "graphics" / "particules" / "before_jump"),
-            'after_jump': import_folder(BASE_DIR / "graphics" / "particules" / "after_jump"),
-            'mushroom_death': import_folder(BASE_DIR / "graphics" / "enemies" / "mushroom" / "death"),
-            'player_death': import_folder(BASE_DIR / "graphics" / "player" / "death")
-        }
+        self.frames = None
+        self.frame_index = 0
+        self.x = 0
+        self.y = 0
+        self.velocity_x = 0
+        self.velocity_y = 0
 
-    def create_particules(self, animation_type: str, pos: tuple[int, int], group: pygame.sprite.Group):
-        animation_frames = self.frames[animation_type]
-        ParticuleEffect(pos, animation_frames, group)
 
+class Emitter:
+    def __init__(self, frames: list[pygame.Surface], count: int = 1, spread: float = 0):
+        # spread is the largest particle speed, in pixels per second
+        self.frames = frames
+        self.count = count
+        self.spread = spread
 
-class ParticuleEffect(pygame.sprite.Sprite):
-    def __init__(self, pos: tuple[int, int], animation_frames: list[pygame.Surface], group: pygame.sprite.Group):
-        super().__init__(group)
 
-        # Animation
-        self.frames = animation_frames
-        self.frame_index = 0
+class ParticuleManager:
+    def __init__(self, capacity: int = PARTICULE_POOL_SIZE):
+        self.emitters = {
+            'before_jump': Emitter(import_folder(BASE_DIR / "graphics" / "particules" / "before_jump")),
+            'after_jump': Emitter(import_folder(BASE_DIR / "graphics" / "particules" / "after_jump")),
+            'mushroom_death': Emitter(import_folder(BASE_DIR / "graphics" / "enemies" / "mushroom" / "death")),
+            'player_death': Emitter(import_folder(BASE_DIR / "graphics" / "player" / "death"))
+        }
         self.animation_speed = 0.15 * TARGET_FPS
 
-        # Setup
-        self.image = self.frames[self.frame_index]
-        self.rect = self.image.get_rect(topleft=pos)
-        self.z = LAYERS['main']
+        # Pool, allocated once
+        self.pool = [Particule() for _ in range(capacity)]
+        self.free = list(self.pool)
+        self.active = []
+
+    def create_particules(self, animation_type: str, pos: tuple[int, int], count: int = None):
+        emitter = self.emitters[animation_type]
+        for _ in range(emitter.count if count is None else count):
+            if not self.free:
+                return
 
-    def animate(self, dt: float):
-        self.frame_index += self.animation_speed * dt
-        if self.frame_index >= len(self.frames):
-            self.kill()
-        else:
-            self.image = self.frames[int(self.frame_index)]
+            particule = self.free.pop()
+            particule.frames = emitter.frames
+            particule.frame_index = 0
+            particule.x, particule.y = pos
+            if emitter.spread:
+                particule.velocity_x = effects_rng.uniform(-emitter.spread, emitter.spread)
+                particule.velocity_y = effects_rng.uniform(-emitter.spread, emitter.spread)
+            else:
+                particule.velocity_x = particule.velocity_y = 0
+            self.active.append(particule)
 
     def update(self, dt: float):
-        self.animate(dt)
+        frame_step = self.animation_speed * dt
+        alive = []
+        for particule in self.active:
+            particule.frame_index += frame_step
+            if particule.frame_index >= len(particule.frames):
+                self.free.append(particule)
+            else:
+                particule.x += particule.velocity_x * dt
+                particule.y += particule.velocity_y * dt
+                alive.append(particule)
+        self.active = alive
+
+    def clear(self):
+        self.free.extend(self.active)
+        self.active = []
+
+    def draw(self, display_surface: pygame.Surface, offset: pygame.math.Vector2) -> int:
+        display_surface.blits([(particule.frames[int(particule.frame_index)],
+                                (particule.x - offset.x, particule.y - offset.y)) for particule in self.active], False)
+        return len(self.active)
+
+    def rects(self, offset: pygame.math.Vector2) -> list[pygame.Rect]:
+        # One pixel of margin for the rounding of the float positions
+        return [particule.frames[int(particule.frame_index)].get_rect(
+            topleft=(particule.x - offset.x, particule.y - offset.y)).inflate(2, 2) for particule in self.active]
@@ -1,15 +1,18 @@
 import pygame
 
+from src.collision import sweep, push_out
+from src.controls import Actions, read_keyboard, read_joystick
+from src.profiler import profiler
 from src.settings import TARGET_FPS, BASE_DIR, LAYERS
-from src.support import import_folder, wave_value
-from src.tile import Tile
+from src.support import import_folder, wave_value, faded
+from src.tilemap import TileMapGroup
 from src.timer import Timer
 
 
 class Player(pygame.sprite.Sprite):
     def __init__(self, pos: tuple[int, int], group: pygame.sprite.Group,
-                 collision_sprites: pygame.sprite.Group, create_attack, destroy_attack, create_particules,
-                 joysticks: list[pygame.joystick.Joystick]):
+                 terrain: TileMapGroup, create_attack, destroy_attack, create_particules,
+                 joysticks: list[pygame.joystick.Joystick], controls=None):
         super().__init__(group)
 
         # Animation
@@ -29,8 +32,10 @@ class Player(pygame.sprite.Sprite):
         # Setup
         self.image = self.animations[self.status][self.frame_index]
         self.rect = self.image.get_rect(topleft=pos)
+        self.old_rect = self.rect.copy()
         self.z = LAYERS['main']
         self.joysticks = joysticks
+        self.controls = controls
 
         # Movement
         self.direction = pygame.math.Vector2()
@@ -38,7 +43,7 @@ class Player(pygame.sprite.Sprite):
         self.speed = 8 * TARGET_FPS
         self.gravity = 0.8 * TARGET_FPS
         self.jump_speed = 20
-        self.collision_sprites = collision_sprites
+        self.terrain = terrain
         self.on_floor = False
         self.can_double_jump = False
         self.can_dash = True
@@ -80,112 +85,63 @@ class Player(pygame.sprite.Sprite):
 
         # hit
         if not self.vulnerable and not self.timers['dash'].active:
-            alpha = wave_value()
-            self.image.set_alpha(alpha)
+            self.image = faded(self.image, wave_value())
         else:
-            self.image.set_alpha(self.alpha)
+            self.image = faded(self.image, self.alpha)
 
     def change_joysticks(self, joysticks: list[pygame.joystick.Joystick]):
         self.joysticks = joysticks
 
+    def get_actions(self) -> Actions:
+        if self.controls:
+            return self.controls.get_actions()
+        if len(self.joysticks) == 0:
+            return read_keyboard()
+        return read_joystick(self.joysticks[0])
+
     def input(self):
-        if not self.timers['dash'].active and not self.timers['attacking'].active:
-            if len(self.joysticks) == 0:
-                keys = pygame.key.get_pressed()
-
-                # Movement
-                if keys[pygame.K_RIGHT]:
-                    self.direction.x = 1
-                    self.status = 'right'
-                elif keys[pygame.K_LEFT]:
-                    self.direction.x = -1
-                    self.status = 'left'
-                else:
-                    self.direction.x = 0
-
-                # Attack
-                if keys[pygame.K_q] and self.can_attack:
-                    self.timers['attacking'].activate()
-                    self.speed_animation = 4 * 3
-                    self.frame_index = 0
-                    self.can_attack = False
-                    self.direction = pygame.math.Vector2()
-
-                    if keys[pygame.K_UP]:
-                        self.create_attack('top')
-                    elif keys[pygame.K_DOWN]:
-                        self.create_attack('bottom')
-                    else:
-                        self.create_attack(self.status.split('_')[0])
-
-                # Jump
-                if keys[pygame.K_SPACE] and (self.on_floor or self.can_double_jump):
-                    if self.on_floor:
-                        self.timers['double jump'].activate()
-                    self.can_double_jump = False
-                    self.direction.y = -self.jump_speed
-                    self.frame_index = 0
-                    self.create_particules('before_jump', self.rect.topleft)
-
-                # Dash
-                if keys[pygame.K_RCTRL] and self.can_dash:
-                    self.direction.y = 0
-                    self.can_dash = False
-                    self.timers['dash'].activate()
-                    self.vulnerable = False
-                    self.speed *= 4
+        actions = self.get_actions()
 
+        if not self.timers['dash'].active and not self.timers['attacking'].active:
+            # Movement
+            if actions.move > 0:
+                self.direction.x = actions.move
+                self.status = 'right'
+            elif actions.move < 0:
+                self.direction.x = actions.move
+                self.status = 'left'
             else:
-                axis = self.joysticks[0].get_axis(0)
-                if abs(axis) < 0.3:
-                    axis = 0
-
-                # Movement
-                if axis > 0:
-                    self.direction.x = axis
-                    self.status = 'right'
-                elif axis < 0:
-                    self.direction.x = axis
-                    self.status = 'left'
+                self.direction.x = 0
+
+            # Attack
+            if actions.attack and self.can_attack:
+                self.timers['attacking'].activate()
+                self.speed_animation = 4 * 3
+                self.frame_index = 0
+                self.can_attack = False
+                self.direction = pygame.math.Vector2()
+
+                if actions.aim:
+                    self.create_attack(actions.aim)
                 else:
-                    self.direction.x = 0
-
-                # Attack
-                if self.joysticks[0].get_button(2) and self.can_attack:
-                    self.timers['attacking'].activate()
-                    self.speed_animation = 4 * 3
-                    self.frame_index = 0
-                    self.can_attack = False
-                    self.direction = pygame.math.Vector2()
-
-                    if axis != 0:
-                        self.create_attack(self.status.split('_')[0])
-                    else:
-                        axis = self.joysticks[0].get_axis(1)
-                        if abs(axis) < 0.3:
-                            axis = 0
-
-                        if axis < 0:
-                            self.create_attack('top')
-                        elif axis > 0:
-                            self.create_attack('bottom')
-
-                # Jump
-                if self.joysticks[0].get_button(0) and (self.on_floor or self.can_double_jump):
-                    if self.on_floor:
-                        self.timers['double jump'].activate()
-                    self.can_double_jump = False
-                    self.direction.y = -self.jump_speed
-                    self.frame_index = 0
-                    self.create_particules('before_jump', self.rect.topleft)
-
-                # Dash
-                if self.joysticks[0].get_button(5) and self.can_dash:
-                    self.direction.y = 0
-                    self.can_dash = False
-                    self.timers['dash'].activate()
-                    self.vulnerable = False
-                    self.speed *= 4
+                    self.create_attack(self.status.split('_')[0])
+
+            # Jump
+            if actions.jump and (self.on_floor or self.can_double_jump):
+                if self.on_floor:
+                    self.timers['double jump'].activate()
+                self.can_double_jump = False
+                self.direction.y = -self.jump_speed
+                self.frame_index = 0
+                self.create_particules('before_jump', self.rect.topleft)
+
+            # Dash
+            if actions.dash and self.can_dash:
+                self.direction.y = 0
+                self.can_dash = False
+                self.timers['dash'].activate()
+                self.vulnerable = False
+                self.speed *= 4
 
     def get_status(self):
         # idle
@@ -205,29 +161,48 @@ class Player(pygame.sprite.Sprite):
         if self.timers['attacking'].active:
             self.status = self.status.split('_')[0] + '_attack'
 
-    def horizontal_collisions(self):
-        for sprite in self.collision_sprites.sprites():
-            if sprite.rect.colliderect(self.rect):
-                if self.direction.x < 0:
-                    self.rect.left = sprite.rect.right
-                if self.direction.x > 0:
-                    self.rect.right = sprite.rect.left
-                self.pos.x = self.rect.x
-
-    def vertical_collisions(self):
-        for sprite in self.collision_sprites.sprites():  # type: Tile
-            if sprite.rect.colliderect(self.rect):
-                if self.direction.y > 0:
-                    self.rect.bottom = sprite.rect.top
-                    self.direction.y = 0
-                    self.on_floor = True
-                    self.can_double_jump = False
-                    if 'fall' in self.status:
-                        self.create_particules('after_jump', self.rect.topleft)
-                if self.direction.y < 0:
-                    self.rect.top = sprite.rect.bottom
-                    self.direction.y = 0
-                self.pos.y = self.rect.y
+    def leave_terrain(self):
+        # A rect already inside terrain, after a respawn or a resize, is not stopped by the sweeps below
+        rects = self.terrain.solid_rects(self.rect)
+        if rects:
+            x, y = push_out(self.rect, rects)
+            self.rect.move_ip(x, y)
+            self.pos.update(self.rect.topleft)
+            if y:
+                self.direction.y = 0
+
+    def horizontal_collisions(self, distance: int):
+        # Swept over the whole move, so a dash or a long frame can not go through thin terrain
+        rects = self.terrain.solid_rects(self.rect.union(self.rect.move(distance, 0)))
+        profiler.count('collision_tests', len(rects))
+        contact = sweep(self.rect, (distance, 0), rects)
+        if contact:
+            if contact.normal[0] > 0:
+                self.rect.left = contact.rect.right
+            else:
+                self.rect.right = contact.rect.left
+            self.pos.x = self.rect.x
+        else:
+            self.rect.x += distance
+
+    def vertical_collisions(self, distance: int):
+        rects = self.terrain.solid_rects(self.rect.union(self.rect.move(0, distance)))
+        profiler.count('collision_tests', len(rects))
+        contact = sweep(self.rect, (0, distance), rects)
+        if contact:
+            if contact.normal[1] < 0:
+                self.rect.bottom = contact.rect.top
+                self.direction.y = 0
+                self.on_floor = True
+                self.can_double_jump = False
+                if 'fall' in self.status:
+                    self.create_particules('after_jump', self.rect.topleft)
+            else:
+                self.rect.top = contact.rect.bottom
+                self.direction.y = 0
+            self.pos.y = self.rect.y
+        else:
+            self.rect.y += distance
 
         if self.on_floor and self.direction.y != 0:
             self.on_floor = False
@@ -235,17 +210,17 @@ class Player(pygame.sprite.Sprite):
     def apply_gravity(self, dt: float):
         self.direction.y += self.gravity * dt
         self.pos.y += self.direction.y * dt * TARGET_FPS
-        self.rect.y = round(self.pos.y)
 
     def move(self, dt: float):
+        self.leave_terrain()
+
         # Horizontal
         self.pos.x += self.direction.x * self.speed * dt
-        self.rect.x = round(self.pos.x)
-        self.horizontal_collisions()
+        self.horizontal_collisions(round(self.pos.x) - self.rect.x)
 
         # Vertical
         self.apply_gravity(dt)
-        self.vertical_collisions()
+        self.vertical_collisions(round(self.pos.y) - self.rect.y)
 
     def draw_debug(self, display_surface: pygame.Surface, offset: pygame.math.Vector2):
         # draw rect
@@ -253,6 +228,36 @@ class Player(pygame.sprite.Sprite):
         offset_rect.topleft -= offset
         pygame.draw.rect(display_surface, 'white', offset_rect, 3)
 
+    def snapshot(self, origin: tuple[int, int]) -> dict:
+        # Plain values with the position relative to the room, so the state also fits in a save file
+        return {
+            'pos': [self.pos.x - origin[0], self.pos.y - origin[1]],
+            'direction': [self.direction.x, self.direction.y],
+            'status': self.status, 'frame_index': self.frame_index, 'speed_animation': self.speed_animation,
+            'speed': self.speed, 'health': self.health, 'vulnerable': self.vulnerable, 'on_floor': self.on_floor,
+            'can_double_jump': self.can_double_jump, 'can_dash': self.can_dash, 'can_attack': self.can_attack,
+            'timers': {name: timer.snapshot() for name, timer in self.timers.items()}
+        }
+
+    def restore(self, state: dict, origin: tuple[int, int]):
+        self.pos.update(state['pos'][0] + origin[0], state['pos'][1] + origin[1])
+        self.rect.topleft = (round(self.pos.x), round(self.pos.y))
+        self.old_rect = self.rect.copy()
+        self.direction.update(state['direction'])
+        self.status = state['status']
+        self.frame_index = state['frame_index']
+        self.speed_animation = state['speed_animation']
+        self.speed = state['speed']
+        self.health = state['health']
+        self.vulnerable = state['vulnerable']
+        self.on_floor = state['on_floor']
+        self.can_double_jump = state['can_double_jump']
+        self.can_dash = state['can_dash']
+        self.can_attack = state['can_attack']
+        for name, remaining in state['timers'].items():
+            self.timers[name].restore(remaining)
+        self.animate(0)
+
     def activate_double_jump(self):
         self.can_double_jump = True
 
@@ -275,14 +280,10 @@ class Player(pygame.sprite.Sprite):
     def reset_attack(self):
         self.can_attack = True
 
-    def update_timers(self):
-        for timer in self.timers.values():  # type: Timer
-            timer.update()
-
     def update(self, dt: float):
+        self.old_rect = self.rect.copy()
         self.input()
         self.get_status()
-        self.update_timers()
 
         self.move(dt)
         self.animate(dt)
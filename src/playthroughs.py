@@ -0,0 +1,189 @@
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sys
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import mean
+
+import pygame
+
+from src.atlas import asset_groups, atlases
+from src.benchmark import scripted_run, frame_stats, git_commit
+from src.controls import Actions, ScriptedControls
+from src.headless import Simulation
+from src.level_data import LEVELS
+from src.map_cache import read_map
+from src.settings import BASE_DIR
+
+MAPS = sorted(path.stem for path in (BASE_DIR / 'data').glob('*.tmx'))
+
+
+def random_run(seed: int):
+    # Random inputs held for half a second at a time, the same for a given seed
+    rng = random.Random(seed)
+    held = {'move': 0, 'jump': False}
+
+    def script(frame: int) -> Actions:
+        if frame % 30 == 0:
+            held['move'] = rng.choice((-1, 0, 1, 1))
+            held['jump'] = rng.random() < 0.4
+        attack = rng.random() < 0.03
+        return Actions(
+            move=held['move'],
+            jump=held['jump'] and frame % 30 < 10,
+            attack=attack,
+            dash=rng.random() < 0.01,
+            aim=rng.choice((None, 'top', 'bottom')) if attack else None
+        )
+
+    return script
+
+
+POLICIES = {
+    'scripted': lambda seed: scripted_run,
+    'random': random_run
+}
+
+# Policies that play differently for each seed, the others are run once per map
+SEEDED_POLICIES = {'random'}
+
+
+def start_position(simulation: Simulation, map_name: str) -> tuple[float, float]:
+    # Room coordinates, on the first checkpoint or else where a door from another room leads
+    map_data = simulation.level.map_loader.load(map_name)
+    for obj in map_data.objects('Interaction'):
+        if obj.name == 'Checkpoint':
+            return obj.x, obj.y
+    for neighbour in LEVELS.get(map_name, {}):
+        return LEVELS[map_name][neighbour]
+    return 0, 0
+
+
+def warm_caches():
+    # Atlases and compiled maps written once up front, rather than by every worker that finds them stale
+    for name, sources in asset_groups().items():
+        atlases.read_manifest(name, sources)
+    for map_name in MAPS:
+        read_map(map_name)
+
+
+def run_playthrough(job: dict) -> dict:
+    # Worker process, one headless pygame instance running the playthroughs it is given one after the other
+    result = dict(job, worker=os.getpid(), frames=0, rooms=[job['map']], exits=0, deaths=0, checkpoints=0,
+                  error=None)
+    frame_times = []
+    try:
+        simulation = Simulation(job['seed'], render=job['render'],
+                                controls=ScriptedControls(POLICIES[job['policy']](job['seed'])))
+        level = simulation.level
+        level.load_map(job['map'], *start_position(simulation, job['map']))
+
+        alive = True
+        checkpoint = level.last_checkpoint
+        for _ in range(job['frames']):
+            start = time.perf_counter()
+            simulation.step()
+            frame_times.append((time.perf_counter() - start) * 1000)
+
+            # Outcomes, counted on the step they happen
+            if level.current_level != result['rooms'][-1]:
+                result['rooms'].append(level.current_level)
+                result['exits'] += 1
+            if alive and not level.player.alive():
+                result['deaths'] += 1
+            alive = level.player.alive()
+            if level.last_checkpoint is not checkpoint:
+                checkpoint = level.last_checkpoint
+                result['checkpoints'] += 1
+
+        result['state'] = simulation.state_digest()
+        result['health'] = level.player.health
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    result['frames'] = len(frame_times)
+    result['frame_ms'] = frame_stats(frame_times) if frame_times else None
+    return result
+
+
+def summarize(runs: list[dict]) -> dict:
+    summary = {}
+    for map_name in sorted({run['map'] for run in runs}):
+        map_runs = [run for run in runs if run['map'] == map_name]
+        timed = [run['frame_ms'] for run in map_runs if run['frame_ms']]
+        summary[map_name] = {
+            'runs': len(map_runs),
+            'errors': sum(run['error'] is not None for run in map_runs),
+            'deaths': sum(run['deaths'] for run in map_runs),
+            'runs_with_exit': sum(run['exits'] > 0 for run in map_runs),
+            'rooms_reached': sorted({room for run in map_runs for room in run['rooms']}),
+            'frame_ms': {
+                'p50': mean(stats['p50'] for stats in timed) if timed else None,
+                'p99': max(stats['p99'] for stats in timed) if timed else None
+            }
+        }
+    return summary
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Run many headless playthroughs in parallel and report their outcomes.')
+    parser.add_argument('--maps', nargs='+', choices=MAPS, default=MAPS)
+    parser.add_argument('--policies', nargs='+', choices=list(POLICIES), default=list(POLICIES))
+    parser.add_argument('--runs', type=int, default=8, help='playthroughs per map and seeded policy, one seed each')
+    parser.add_argument('--frames', type=int, default=3600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--render', action='store_true')
+    parser.add_argument('--output', default='playthroughs.json')
+    args = parser.parse_args()
+
+    jobs = [{'map': map_name, 'policy': policy, 'seed': args.seed + i, 'frames': args.frames, 'render': args.render}
+            for map_name in args.maps for policy in args.policies
+            for i in range(args.runs if policy in SEEDED_POLICIES else 1)]
+
+    warm_caches()
+
+    # Spawned workers, so each one starts its own pygame rather than sharing a forked one
+    start = time.perf_counter()
+    runs = []
+    with ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        for future in as_completed([executor.submit(run_playthrough, job) for job in jobs]):
+            run = future.result()
+            runs.append(run)
+            outcome = 'CRASHED' if run['error'] else f"exits {run['exits']}  deaths {run['deaths']}"
+            print(f"[{len(runs)}/{len(jobs)}] {run['map']:<16}{run['policy']:<10}seed {run['seed']:<6}{outcome}")
+    elapsed = time.perf_counter() - start
+
+    runs.sort(key=lambda run: (run['map'], run['policy'], run['seed']))
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'workers': args.workers,
+        'wall_time_s': elapsed,
+        'summary': summarize(runs),
+        'runs': runs
+    }
+
+    print(f"{'map':<16}{'runs':>6}{'errors':>8}{'deaths':>8}{'exited':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    for map_name, stats in report['summary'].items():
+        frame_ms = stats['frame_ms']
+        print(f"{map_name:<16}{stats['runs']:>6}{stats['errors']:>8}{stats['deaths']:>8}{stats['runs_with_exit']:>8}"
+              f"{frame_ms['p50'] or 0:>10.2f}{frame_ms['p99'] or 0:>10.2f}")
+    print(f'{len(runs)} playthroughs in {elapsed:.1f}s on {args.workers} workers')
+
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    print(f'Saved to {args.output}')
+
+    # A crash is a bug in the game, not an outcome of the run, so the batch fails with its traceback
+    crashed = [run for run in runs if run['error']]
+    for run in crashed:
+        print(f"\n{run['map']} {run['policy']} seed {run['seed']} crashed:\n{run['error']}", file=sys.stderr)
+    if crashed:
+        sys.exit(f'{len(crashed)} of {len(runs)} playthroughs crashed')
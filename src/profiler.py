@@ -0,0 +1,126 @@
+import csv
+import json
+import time
+from collections import deque
+from pathlib import Path
+
+import pygame
+
+from src.settings import PROFILE, PROFILER_HISTORY, PROFILER_DUMP_DIR
+
+
+class Phase:
+    def __init__(self, profiler: 'FrameProfiler', name: str):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        phases = self.profiler.phases
+        phases[self.name] = phases.get(self.name, 0) + (time.perf_counter() - self.start) * 1000
+
+
+class NullPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *args):
+        pass
+
+
+class FrameProfiler:
+    def __init__(self, enabled: bool = PROFILE, history: int = PROFILER_HISTORY):
+        self.enabled = enabled
+        self.frames = deque(maxlen=history)
+        self.null_phase = NullPhase()
+
+        # Current frame
+        self.phases = {}
+        self.counters = {}
+        self.frame_start = time.perf_counter()
+
+        # Overlay
+        self.font = None
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.phases.clear()
+        self.counters.clear()
+        self.frame_start = time.perf_counter()
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return self.null_phase
+        return Phase(self, name)
+
+    def count(self, name: str, amount: int = 1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name: str, value: int):
+        if self.enabled:
+            self.counters[name] = value
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+
+        now = time.perf_counter()
+        self.frames.append({
+            'frame_ms': (now - self.frame_start) * 1000,
+            **{f'{name}_ms': duration for name, duration in self.phases.items()},
+            **self.counters
+        })
+        self.phases = {}
+        self.counters = {}
+        self.frame_start = now
+
+    def averages(self, frames: int = 60) -> dict:
+        recent = list(self.frames)[-frames:]
+        totals = {}
+        for frame in recent:
+            for key, value in frame.items():
+                totals[key] = totals.get(key, 0) + value
+        return {key: value / len(recent) for key, value in totals.items()}
+
+    def dump_csv(self, path: Path):
+        fields = list(dict.fromkeys(key for frame in self.frames for key in frame))
+        with open(path, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fields, restval=0)
+            writer.writeheader()
+            writer.writerows(self.frames)
+
+    def dump_json(self, path: Path):
+        with open(path, 'w') as file:
+            json.dump(list(self.frames), file)
+
+    def dump(self, directory: Path = PROFILER_DUMP_DIR) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / time.strftime('profile_%Y%m%d_%H%M%S')
+        self.dump_csv(path.with_suffix('.csv'))
+        self.dump_json(path.with_suffix('.json'))
+        return path
+
+    def draw(self, display_surface: pygame.Surface):
+        if not self.enabled or not self.frames:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font(None, 22)
+
+        averages = self.averages()
+        worst = max(frame['frame_ms'] for frame in self.frames)
+        lines = [f"frame {averages.pop('frame_ms'):.2f} ms (worst {worst:.2f})"]
+        lines += [f'{key} {value:.2f}' if key.endswith('_ms') else f'{key} {value:.0f}'
+                  for key, value in averages.items()]
+
+        y = display_surface.get_height() - 10 - len(lines) * 18
+        for line in lines:
+            text_surf = self.font.render(line, True, 'white', 'black')
+            display_surface.blit(text_surf, (10, y))
+            y += 18
+
+
+profiler = FrameProfiler()
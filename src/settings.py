@@ -1,8 +1,13 @@
 from pathlib import Path
 
 # Utils
-FPS = 10000
+FPS = 60  # render cap, 0 for uncapped
 TARGET_FPS = 60
+SIMULATION_FPS = 120
+MAX_FRAME_TIME = 0.25
+LOW_POWER = False
+LOW_POWER_FPS = 30
+VSYNC = False
 DEBUG = False
 
 # Screen
@@ -14,6 +19,34 @@ FULLSCREEN = False
 # Path file
 BASE_DIR = Path().resolve()
 
+# Assets
+ASSET_CACHE_BUDGET = None  # bytes, None for no limit
+USE_ATLASES = True
+ATLAS_DIR = BASE_DIR / 'graphics' / '.atlas'
+ATLAS_MAX_WIDTH = 1024
+
+# Maps
+START_LEVEL = 'map_test'
+MAP_CACHE_DIR = BASE_DIR / 'data' / '.cache'
+PRELOAD_ADJACENT_MAPS = True
+
+# World streaming
+MAX_RESIDENT_ROOMS = 3
+STREAM_DISTANCE = 16  # tiles from a door to start building the room behind it
+ROOM_BUILD_BUDGET = 64  # work per step while building a room, one per tile or object, all of it per chunk
+
+# Profiler
+PROFILE = False
+PROFILER_HISTORY = 600
+PROFILER_DUMP_DIR = BASE_DIR / 'profiles'
+
+# Particules
+PARTICULE_POOL_SIZE = 2048
+
+# Enemies
+BATCH_ENEMIES = False  # needs numpy
+ACTIVITY_MARGIN = TILE_SIZE * 4  # beyond the screen around the player, enemies further away sleep
+
 # Colors
 BG_COLOR = '#060C17'
 PLAYER_COLOR = '#C4F7FF'
@@ -27,11 +60,20 @@ CAMERA_BORDERS = {
     'bottom': SCREEN_HEIGHT // 2 + 50
 }
 
+# Rendering
+BAKE_STATIC_LAYERS = False  # terrain drawn from chunks, no faster than the tile map renderer on these maps
+CHUNK_SIZE = 16
+DIRTY_RECTS = False  # redraw and update only the changed parts of the screen
+
+# Collision
+SPATIAL_CELL_SIZE = TILE_SIZE * 4
+
 # Layer
 LAYERS = {
     'invisible': 0,
     'water background': 1,
     'terrain': 2,
     'main': 3,
-    'water': 4,
+    'particules': 4,
+    'water': 5,
 }
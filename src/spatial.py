@@ -0,0 +1,88 @@
+import pygame
+
+from src.profiler import profiler
+from src.settings import SPATIAL_CELL_SIZE
+
+
+class SpatialGroup(pygame.sprite.Group):
+    def __init__(self, *sprites, cell_size: int = SPATIAL_CELL_SIZE):
+        # Grid
+        self.cell_size = cell_size
+        self.cells = {}
+        self.sprite_bounds = {}
+
+        # Insertion order, so ordered queries give the same order as iterating the group
+        self.sprite_order = {}
+        self.next_order = 0
+
+        super().__init__(*sprites)
+
+    def bounds_for(self, rect: pygame.Rect) -> tuple[int, int, int, int]:
+        return (rect.left // self.cell_size, rect.top // self.cell_size,
+                (rect.right - 1) // self.cell_size, (rect.bottom - 1) // self.cell_size)
+
+    @staticmethod
+    def cells_in(bounds: tuple[int, int, int, int]) -> list[tuple[int, int]]:
+        left, top, right, bottom = bounds
+        return [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+
+    def cells_for(self, rect: pygame.Rect) -> list[tuple[int, int]]:
+        return self.cells_in(self.bounds_for(rect))
+
+    def bin(self, sprite: pygame.sprite.Sprite, bounds: tuple[int, int, int, int]):
+        self.sprite_bounds[sprite] = bounds
+        for key in self.cells_in(bounds):
+            self.cells.setdefault(key, {})[sprite] = None
+
+    def unbin(self, sprite: pygame.sprite.Sprite):
+        for key in self.cells_in(self.sprite_bounds.pop(sprite)):
+            cell = self.cells[key]
+            del cell[sprite]
+            if not cell:
+                del self.cells[key]
+
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer=None):
+        super().add_internal(sprite, layer)
+
+        self.sprite_order[sprite] = self.next_order
+        self.next_order += 1
+        self.bin(sprite, self.bounds_for(sprite.rect))
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite):
+        super().remove_internal(sprite)
+
+        if sprite in self.sprite_bounds:
+            self.unbin(sprite)
+            del self.sprite_order[sprite]
+
+    def move(self, sprite: pygame.sprite.Sprite):
+        # Moving sprites are only binned again once they cross into another cell
+        bounds = self.bounds_for(sprite.rect)
+        if bounds != self.sprite_bounds[sprite]:
+            self.unbin(sprite)
+            self.bin(sprite, bounds)
+
+    def refresh(self, sprites=None):
+        # The sprites that may have moved, every one of the group by default, checked inline as it runs per frame
+        cell_size = self.cell_size
+        sprite_bounds = self.sprite_bounds
+        for sprite in self.sprites() if sprites is None else sprites:
+            bounds = sprite_bounds.get(sprite)
+            if bounds is not None:
+                x, y, width, height = sprite.rect
+                if bounds != (x // cell_size, y // cell_size,
+                              (x + width - 1) // cell_size, (y + height - 1) // cell_size):
+                    self.move(sprite)
+
+    def collide(self, rect: pygame.Rect, ordered: bool = False) -> list[pygame.sprite.Sprite]:
+        # Only the sprites sharing a grid cell with rect are tested, sorted only for callers picking one of them
+        found = {}
+        for key in self.cells_for(rect):
+            cell = self.cells.get(key)
+            if cell:
+                found.update(cell)
+        profiler.count('collision_tests', len(found))
+        hits = [sprite for sprite in found if sprite.rect.colliderect(rect)]
+        if ordered and len(hits) > 1:
+            hits.sort(key=self.sprite_order.__getitem__)
+        return hits
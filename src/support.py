@@ -1,11 +1,99 @@
+from collections import OrderedDict
 from math import sin
 from os import walk
 from pathlib import Path
+from random import Random
+from weakref import WeakKeyDictionary
 
 import pygame
 
+from src.clock import get_ticks
+from src.atlas import atlases
+from src.settings import ASSET_CACHE_BUDGET, USE_ATLASES
+
+# Gameplay and cosmetic randomness are kept apart, so drawing never changes the simulation
+rng = Random()
+effects_rng = Random()
+
+# Faded copies of shared frames by alpha, dropped along with the frame they were made from
+faded_frames = WeakKeyDictionary()
+
+
+def seed_random(seed: int):
+    rng.seed(seed)
+    effects_rng.seed(seed)
+
+
+class AssetCache:
+    def __init__(self, budget: int = None):
+        # Setup
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.size = 0
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, loader):
+        if key in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        self.misses += 1
+        value = loader()
+        self.store(key, value)
+        return value
+
+    def store(self, key, value):
+        self.discard(key)
+        surfaces = value if isinstance(value, list) else [value]
+        self.entries[key] = value
+        self.sizes[key] = sum(surf.get_bytesize() * surf.get_width() * surf.get_height() for surf in surfaces)
+        self.size += self.sizes[key]
+        self.evict()
+
+    def discard(self, key):
+        if key in self.entries:
+            del self.entries[key]
+            self.size -= self.sizes.pop(key)
+
+    def evict(self):
+        if self.budget is None:
+            return
+        while self.size > self.budget and len(self.entries) > 1:
+            key = next(iter(self.entries))
+            self.discard(key)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.size = 0
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self.entries),
+            'size': self.size,
+            'budget': self.budget,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+assets = AssetCache(ASSET_CACHE_BUDGET)
+
+
+def load_folder(path: Path) -> list[pygame.Surface]:
+    if USE_ATLASES:
+        frames = atlases.load_folder(path)
+        if frames is not None:
+            return frames
 
-def import_folder(path: Path) -> list[pygame.Surface]:
     surface_list = []
 
     for _, __, img_files in walk(path):
@@ -17,8 +105,35 @@ def import_folder(path: Path) -> list[pygame.Surface]:
     return surface_list
 
 
+def import_folder(path: Path) -> list[pygame.Surface]:
+    return assets.get(Path(path), lambda: load_folder(path))
+
+
+def load_image(path: Path) -> pygame.Surface:
+    if USE_ATLASES:
+        image = atlases.load_image(path)
+        if image is not None:
+            return image
+    return pygame.image.load(path).convert_alpha()
+
+
+def import_image(path: Path) -> pygame.Surface:
+    return assets.get(Path(path), lambda: load_image(path))
+
+
+def faded(surf: pygame.Surface, alpha: int) -> pygame.Surface:
+    # Frames are shared through the asset cache, so fading one uses a copy, made once for each alpha
+    if alpha == 255:
+        return surf
+    variants = faded_frames.setdefault(surf, {})
+    if alpha not in variants:
+        variants[alpha] = surf.copy()
+        variants[alpha].set_alpha(alpha)
+    return variants[alpha]
+
+
 def wave_value():
-    value = sin(pygame.time.get_ticks())
+    value = sin(get_ticks())
     if value >= 0:
         return 255
     else:
@@ -1,6 +1,7 @@
 import pygame
 
 from src.settings import LAYERS, TILE_SIZE
+from src.support import faded
 
 
 class Tile(pygame.sprite.Sprite):
@@ -10,11 +11,11 @@ class Tile(pygame.sprite.Sprite):
                  z: int = LAYERS['main'],
                  alpha: int = 255):
         # Setup
-        super().__init__(groups)
         self.image = surf
         self.image.set_alpha(alpha)
         self.rect = self.image.get_rect(topleft=pos)
         self.z = z
+        super().__init__(groups)
 
     def draw_debug(self, display_surface: pygame.Surface, offset: pygame.math.Vector2):
         offset_rect = self.rect.copy()
@@ -22,33 +23,18 @@ class Tile(pygame.sprite.Sprite):
         pygame.draw.rect(display_surface, 'white', offset_rect, 3)
 
 
-class AnimatedTile(Tile):
-    def __init__(self, pos: tuple[int, int], frames: list[pygame.Surface],
-                 groups: list[pygame.sprite.AbstractGroup], speed_animation: int = 5, z: int = LAYERS['main'],
-                 alpha: int = 255):
-        # Animation
-        self.frames = frames
+class Animation:
+    def __init__(self, frames: list[pygame.Surface], speed_animation: int = 5, alpha: int = 255):
+        self.frames = [faded(frame, alpha) for frame in frames]
         self.frame_index = 0
         self.speed_animation = speed_animation
+        self.image = self.frames[0]
 
-        # Setup
-        super().__init__(
-            pos=pos,
-            surf=self.frames[self.frame_index],
-            groups=groups,
-            z=z
-        )
-        self.alpha = alpha
-
-    def animate(self, dt: float):
+    def update(self, dt: float):
         self.frame_index += self.speed_animation * dt
         if self.frame_index >= len(self.frames):
             self.frame_index = 0
         self.image = self.frames[int(self.frame_index)]
-        self.image.set_alpha(self.alpha)
-
-    def update(self, dt: float):
-        self.animate(dt)
 
 
 class ExitTile(Tile):
@@ -57,12 +43,11 @@ class ExitTile(Tile):
                  width: int, height: int,
                  groups: list[pygame.sprite.AbstractGroup],
                  ):
-        # Setup
+        # Setup, at full size before joining the groups, which bin it by its rect
         super().__init__(
             pos=pos,
-            groups=groups)
-        self.image = pygame.Surface((width, height))
-        self.rect = self.image.get_rect(topleft=pos)
+            groups=groups,
+            surf=pygame.Surface((width, height)))
 
         self.current_level = current_level
         self.new_level = new_level
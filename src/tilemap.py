@@ -0,0 +1,218 @@
+import math
+from array import array
+from typing import Optional
+
+import pygame
+
+from src.settings import TILE_SIZE, SPATIAL_CELL_SIZE
+
+
+class TileMap:
+    def __init__(self, origin: tuple[int, int], width: int, height: int, tileset: list):
+        # One gid per cell, 0 is empty, tileset[gid] is the surface or the shared Animation drawn for it
+        self.origin = origin
+        self.width = width
+        self.height = height
+        self.tileset = tileset
+        self.gids = array('H', bytes(width * height * 2))
+        self.rect = pygame.Rect(origin, (width * TILE_SIZE, height * TILE_SIZE))
+        self.groups = []
+
+        # Baked layers drawing this map, told about every changed cell
+        self.static_layers = []
+
+        # Collisions, the solid cells merged into as few rects as possible, binned in a grid by index
+        self.colliders = None
+        self.collider_cells = None
+
+    def set_tile(self, col: int, row: int, gid: int):
+        self.gids[row * self.width + col] = gid
+        self.colliders = None
+        for layer in self.static_layers:
+            layer.tile_changed(col, row)
+
+    def remove_tile(self, col: int, row: int):
+        self.set_tile(col, row, 0)
+
+    def get_tile(self, col: int, row: int) -> int:
+        if 0 <= col < self.width and 0 <= row < self.height:
+            return self.gids[row * self.width + col]
+        return 0
+
+    def cell_at(self, x: float, y: float) -> tuple[int, int]:
+        return int((x - self.origin[0]) // TILE_SIZE), int((y - self.origin[1]) // TILE_SIZE)
+
+    def tile_at(self, x: float, y: float) -> int:
+        return self.get_tile(*self.cell_at(x, y))
+
+    def cell_rect(self, col: int, row: int) -> pygame.Rect:
+        return pygame.Rect(self.origin[0] + col * TILE_SIZE, self.origin[1] + row * TILE_SIZE, TILE_SIZE, TILE_SIZE)
+
+    def cells(self, rect: pygame.Rect = None):
+        # Non empty cells as (col, row, gid), row by row, inside rect when given
+        left, top, right, bottom = 0, 0, self.width - 1, self.height - 1
+        if rect is not None:
+            left = max(left, (rect.left - self.origin[0]) // TILE_SIZE)
+            top = max(top, (rect.top - self.origin[1]) // TILE_SIZE)
+            right = min(right, (rect.right - 1 - self.origin[0]) // TILE_SIZE)
+            bottom = min(bottom, (rect.bottom - 1 - self.origin[1]) // TILE_SIZE)
+
+        gids = self.gids
+        for row in range(top, bottom + 1):
+            start = row * self.width
+            for col in range(left, right + 1):
+                gid = gids[start + col]
+                if gid:
+                    yield col, row, gid
+
+    def build_colliders(self):
+        # Runs of cells along each row, grown downwards while the row below has the same run
+        self.colliders = []
+        open_runs = {}
+        for row in range(self.height):
+            runs = {}
+            start = None
+            for col in range(self.width + 1):
+                solid = col < self.width and self.gids[row * self.width + col]
+                if solid and start is None:
+                    start = col
+                elif not solid and start is not None:
+                    rect = open_runs.get((start, col))
+                    if rect:
+                        rect.height += TILE_SIZE
+                    else:
+                        rect = self.cell_rect(start, row)
+                        rect.width = (col - start) * TILE_SIZE
+                        self.colliders.append(rect)
+                    runs[(start, col)] = rect
+                    start = None
+            open_runs = runs
+
+        self.collider_cells = {}
+        for index, rect in enumerate(self.colliders):
+            for key in self.grid_cells(rect):
+                self.collider_cells.setdefault(key, []).append(index)
+
+    @staticmethod
+    def grid_cells(rect: pygame.Rect) -> list[tuple[int, int]]:
+        return [(x, y) for x in range(rect.left // SPATIAL_CELL_SIZE, (rect.right - 1) // SPATIAL_CELL_SIZE + 1)
+                for y in range(rect.top // SPATIAL_CELL_SIZE, (rect.bottom - 1) // SPATIAL_CELL_SIZE + 1)]
+
+    def solid_rects(self, rect: pygame.Rect) -> list[pygame.Rect]:
+        if self.colliders is None:
+            self.build_colliders()
+        indices = set()
+        for key in self.grid_cells(rect):
+            indices.update(self.collider_cells.get(key, ()))
+        # In build order, so the first contact of a sweep does not depend on the grid
+        return [self.colliders[index] for index in sorted(indices) if self.colliders[index].colliderect(rect)]
+
+    def raycast(self, start: tuple[float, float], direction: tuple[float, float],
+                max_distance: float) -> Optional[tuple[float, tuple[int, int]]]:
+        # Grid traversal, the distance along the ray to the first non empty cell and that cell
+        length = math.hypot(*direction)
+        if not length:
+            return None
+        dx, dy = direction[0] / length, direction[1] / length
+        x, y = start[0] - self.origin[0], start[1] - self.origin[1]
+        col, row = int(x // TILE_SIZE), int(y // TILE_SIZE)
+
+        step_col = 1 if dx > 0 else -1
+        step_row = 1 if dy > 0 else -1
+        next_x = ((col + (dx > 0)) * TILE_SIZE - x) / dx if dx else math.inf
+        next_y = ((row + (dy > 0)) * TILE_SIZE - y) / dy if dy else math.inf
+        delta_x = TILE_SIZE / abs(dx) if dx else math.inf
+        delta_y = TILE_SIZE / abs(dy) if dy else math.inf
+
+        distance = 0
+        while distance <= max_distance:
+            # Outside of the grid and going further away, so nothing left to hit even without a max distance
+            if ((col < 0 and dx <= 0) or (col >= self.width and dx >= 0) or
+                    (row < 0 and dy <= 0) or (row >= self.height and dy >= 0)):
+                return None
+            if self.get_tile(col, row):
+                return distance, (col, row)
+            if next_x < next_y:
+                col += step_col
+                distance = next_x
+                next_x += delta_x
+            else:
+                row += step_row
+                distance = next_y
+                next_y += delta_y
+        return None
+
+    def kill(self):
+        for group in list(self.groups):
+            group.remove(self)
+
+
+class TileMapGroup:
+    def __init__(self):
+        self.display_surface = pygame.display.get_surface()
+        self.tile_maps = []
+
+        # Dirty rects, the frame of every animation when it was last drawn
+        self.drawn_images = {}
+
+    def __len__(self) -> int:
+        return len(self.tile_maps)
+
+    def __iter__(self):
+        return iter(self.tile_maps)
+
+    def add(self, tile_map: TileMap):
+        self.tile_maps.append(tile_map)
+        tile_map.groups.append(self)
+
+    def remove(self, tile_map: TileMap):
+        self.tile_maps.remove(tile_map)
+        tile_map.groups.remove(self)
+
+    def empty(self):
+        for tile_map in list(self.tile_maps):
+            self.remove(tile_map)
+
+    def solid_rects(self, rect: pygame.Rect) -> list[pygame.Rect]:
+        return [cell_rect for tile_map in self.tile_maps if tile_map.rect.colliderect(rect)
+                for cell_rect in tile_map.solid_rects(rect)]
+
+    def raycast(self, start: tuple[float, float], direction: tuple[float, float],
+                max_distance: float) -> Optional[tuple[float, TileMap, tuple[int, int]]]:
+        hits = []
+        for tile_map in self.tile_maps:
+            hit = tile_map.raycast(start, direction, max_distance)
+            if hit:
+                hits.append((hit[0], tile_map, hit[1]))
+        return min(hits, key=lambda hit: hit[0], default=None)
+
+    def draw(self, display_surface: pygame.Surface, offset: pygame.math.Vector2) -> int:
+        # Only the cells inside the clip area, which is a dirty rect when redrawing part of the screen
+        view_rect = display_surface.get_clip().move(offset.x, offset.y)
+        count = 0
+        for tile_map in self.tile_maps:
+            if tile_map.rect.colliderect(view_rect):
+                tileset = tile_map.tileset
+                blits = [(getattr(tileset[gid], 'image', tileset[gid]),
+                          (tile_map.origin[0] + col * TILE_SIZE - offset.x,
+                           tile_map.origin[1] + row * TILE_SIZE - offset.y))
+                         for col, row, gid in tile_map.cells(view_rect)]
+                display_surface.blits(blits, False)
+                count += len(blits)
+        return count
+
+    def rects(self, offset: pygame.math.Vector2) -> list[pygame.Rect]:
+        # Still tiles never change on screen, animated ones only when their animation shows a new frame
+        changed = set()
+        for tile_map in self.tile_maps:
+            for tile in tile_map.tileset:
+                if hasattr(tile, 'image') and self.drawn_images.get(tile) is not tile.image:
+                    self.drawn_images[tile] = tile.image
+                    changed.add(tile)
+        if not changed:
+            return []
+
+        view_rect = self.display_surface.get_rect(topleft=(offset.x, offset.y))
+        return [tile_map.cell_rect(col, row).move(-offset.x, -offset.y)
+                for tile_map in self.tile_maps if tile_map.rect.colliderect(view_rect)
+                for col, row, gid in tile_map.cells(view_rect) if tile_map.tileset[gid] in changed]
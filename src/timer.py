@@ -1,24 +1,72 @@
-import pygame.time
+from heapq import heappush, heappop
+from itertools import count
+
+from src.clock import get_ticks
+
+
+class Scheduler:
+    def __init__(self):
+        self.queue = []
+        self.counter = count()
+
+    def schedule(self, delay: int, func) -> list:
+        entry = [get_ticks() + delay, next(self.counter), func]
+        heappush(self.queue, entry)
+        return entry
+
+    def cancel(self, entry: list):
+        # Cancelled entries stay in the heap and are skipped when they come due
+        entry[2] = None
+
+    def clear(self):
+        self.queue.clear()
+
+    def update(self):
+        current_time = get_ticks()
+        while self.queue and self.queue[0][0] <= current_time:
+            func = heappop(self.queue)[2]
+            if func:
+                func()
+
+
+scheduler = Scheduler()
 
 
 class Timer:
-    def __init__(self, duration: int, func=None):
+    def __init__(self, duration: int, func=None, timer_scheduler: Scheduler = None):
         self.duration = duration
         self.func = func
+        self.scheduler = timer_scheduler or scheduler
         self.start_time = 0
-        self.active = False
+        self.entry = None
+
+    @property
+    def active(self) -> bool:
+        return self.entry is not None
 
     def activate(self):
-        self.active = True
-        self.start_time = pygame.time.get_ticks()
+        self.deactivate()
+        self.start_time = get_ticks()
+        self.entry = self.scheduler.schedule(self.duration, self.expire)
 
     def deactivate(self):
-        self.active = False
+        if self.entry:
+            self.scheduler.cancel(self.entry)
+        self.entry = None
         self.start_time = 0
 
-    def update(self):
-        current_time = pygame.time.get_ticks()
-        if current_time - self.start_time >= self.duration:
-            if self.func and self.start_time != 0:
-                self.func()
-            self.deactivate()
+    def snapshot(self):
+        # Time left in milliseconds, None when not running
+        return self.entry[0] - get_ticks() if self.entry else None
+
+    def restore(self, remaining: int = None):
+        self.deactivate()
+        if remaining is not None:
+            self.start_time = get_ticks() - (self.duration - remaining)
+            self.entry = self.scheduler.schedule(remaining, self.expire)
+
+    def expire(self):
+        self.entry = None
+        self.start_time = 0
+        if self.func:
+            self.func()
@@ -15,7 +15,7 @@ class Transition:
         self.color = 255
         self.speed = -2
 
-    def play(self, dt: float):
+    def update(self, dt: float):
         self.color += self.speed * dt * TARGET_FPS
         if self.color <= 0:
             self.speed *= -1
@@ -26,5 +26,6 @@ class Transition:
             self.speed = -2
             self.stop()
 
+    def draw(self):
         self.image.fill((self.color, self.color, self.color))
         self.display_surface.blit(self.image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
@@ -0,0 +1,137 @@
+import pygame
+
+from src.level_data import LEVELS
+from src.map_cache import MapLoader, CompiledMap
+from src.settings import TILE_SIZE, SCREEN_WIDTH, SCREEN_HEIGHT, MAX_RESIDENT_ROOMS, STREAM_DISTANCE, \
+    ROOM_BUILD_BUDGET
+
+# Rooms are placed further apart than the screen is wide, so a room is never seen from another one
+ROOM_GAP = max(SCREEN_WIDTH, SCREEN_HEIGHT)
+
+
+class Room:
+    def __init__(self, name: str, origin: tuple[int, int], map_data: CompiledMap):
+        self.name = name
+        self.origin = origin
+        self.map_data = map_data
+        self.rect = pygame.Rect(origin, (map_data.width * TILE_SIZE, map_data.height * TILE_SIZE))
+
+        # Content, owned by the room so it can be unloaded on its own
+        self.sprites = []
+        self.enemies = []
+        self.tile_maps = []
+        self.static_layers = []
+        self.exits = []
+        self.collider_sprites = pygame.sprite.Group()
+        self.enemy_batches = {}
+
+        # Streaming
+        self.builder = None
+        self.last_used = 0
+
+    def to_world(self, x: float, y: float) -> tuple[float, float]:
+        return x + self.origin[0], y + self.origin[1]
+
+    def unload(self):
+        for sprite in self.sprites:
+            sprite.kill()
+        for tile_map in self.tile_maps:
+            tile_map.kill()
+        for layer in self.static_layers:
+            for chunk in layer.chunks.values():
+                chunk.kill()
+        self.sprites.clear()
+        self.enemies.clear()
+        self.tile_maps.clear()
+        self.static_layers.clear()
+        self.exits.clear()
+        self.collider_sprites.empty()
+        self.enemy_batches.clear()
+
+
+class World:
+    def __init__(self, map_loader: MapLoader, build_room):
+        # build_room(room) is a generator filling the room, yielding the cost of each piece
+        self.map_loader = map_loader
+        self.build_room = build_room
+
+        self.rooms = {}
+        self.current = None
+        self.steps = 0
+
+        # World position of every room placed so far, kept when a room is unloaded
+        self.placements = {}
+
+    def place(self, name: str, map_data: CompiledMap) -> tuple[int, int]:
+        if name not in self.placements:
+            right = max((rect.right + ROOM_GAP for rect in self.placements.values()), default=0)
+            self.placements[name] = pygame.Rect(right, 0, map_data.width * TILE_SIZE, map_data.height * TILE_SIZE)
+        return self.placements[name].topleft
+
+    def get_room(self, name: str) -> Room:
+        # Resident room, maybe still being built
+        if name not in self.rooms:
+            map_data = self.map_loader.load(name)
+            room = Room(name, self.place(name, map_data), map_data)
+            room.builder = self.build_room(room)
+            self.rooms[name] = room
+        self.rooms[name].last_used = self.steps
+        return self.rooms[name]
+
+    @staticmethod
+    def finish(room: Room):
+        if room.builder is not None:
+            for _ in room.builder:
+                pass
+            room.builder = None
+
+    def enter(self, name: str) -> Room:
+        self.current = self.get_room(name)
+        self.finish(self.current)
+        self.trim()
+        return self.current
+
+    def unload(self, name: str):
+        self.rooms.pop(name).unload()
+
+    def reset(self):
+        for room in self.rooms.values():
+            room.unload()
+        self.rooms.clear()
+        self.current = None
+
+    def trim(self):
+        # Only the current room and its neighbours stay, the least recently used go first over the cap
+        neighbours = LEVELS.get(self.current.name, {})
+        for name in [name for name in self.rooms if name != self.current.name and name not in neighbours]:
+            self.unload(name)
+        while len(self.rooms) > MAX_RESIDENT_ROOMS:
+            self.unload(min((room for room in self.rooms.values() if room is not self.current),
+                            key=lambda room: room.last_used).name)
+
+    def update(self, player_rect: pygame.Rect):
+        self.steps += 1
+        if self.current is None:
+            return
+        self.current.last_used = self.steps
+
+        # Stream in the rooms behind the doors the player is getting close to
+        stream_rect = player_rect.inflate(STREAM_DISTANCE * TILE_SIZE * 2, STREAM_DISTANCE * TILE_SIZE * 2)
+        for exit_sprite in self.current.exits:
+            if exit_sprite.new_level in LEVELS and stream_rect.colliderect(exit_sprite.rect):
+                self.get_room(exit_sprite.new_level)
+        self.trim()
+
+        # A bit of one room per step, so building a room never stalls a frame
+        for room in self.rooms.values():
+            if room.builder is not None:
+                budget = ROOM_BUILD_BUDGET
+                try:
+                    while budget > 0:
+                        budget -= next(room.builder)
+                except StopIteration:
+                    room.builder = None
+                break
+
+    def enemy_batches(self) -> list:
+        return [batch for room in self.rooms.values() for batch in room.enemy_batches.values()]
@@ -0,0 +1,54 @@
+import os
+
+import pygame
+
+from src.chunk import StaticLayer
+from src.settings import TILE_SIZE
+from src.tilemap import TileMap
+
+
+def make_layer() -> tuple[TileMap, StaticLayer]:
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    pygame.display.init()
+    pygame.display.set_mode((64, 64))
+
+    red = pygame.Surface((TILE_SIZE, TILE_SIZE))
+    red.fill('red')
+    tile_map = TileMap((0, 0), 4, 4, [None, red])
+    tile_map.set_tile(1, 2, 1)
+    layer = StaticLayer(tile_map, [pygame.sprite.Group()])
+    for col, row, _ in tile_map.cells():
+        layer.tile_changed(col, row)
+    return tile_map, layer
+
+
+def pixel(layer: StaticLayer, col: int, row: int) -> pygame.Color:
+    chunk = layer.get_chunk((col * TILE_SIZE, row * TILE_SIZE))
+    return chunk.image.get_at((col * TILE_SIZE - chunk.rect.x, row * TILE_SIZE - chunk.rect.y))
+
+
+def transparent(layer: StaticLayer, col: int, row: int) -> bool:
+    color = pixel(layer, col, row)
+    return color.a == 0 or color == layer.get_chunk((col * TILE_SIZE, row * TILE_SIZE)).image.get_colorkey()
+
+
+def test_baked_layer_follows_set_tile():
+    tile_map, layer = make_layer()
+    assert pixel(layer, 1, 2) == pygame.Color('red')
+    assert transparent(layer, 3, 0)
+
+    tile_map.set_tile(3, 0, 1)
+    assert pixel(layer, 3, 0) == pygame.Color('red')
+
+    tile_map.remove_tile(1, 2)
+    assert transparent(layer, 1, 2)
+    assert not tile_map.solid_rects(tile_map.cell_rect(1, 2))
+
+
+def test_partly_transparent_tiles_keep_alpha():
+    tile_map, layer = make_layer()
+    assert layer.colorkey
+    faded = pygame.Surface((TILE_SIZE, TILE_SIZE), pygame.SRCALPHA)
+    faded.fill((0, 0, 255, 100))
+    tile_map.tileset.append(faded)
+    assert not StaticLayer(tile_map, [pygame.sprite.Group()]).colorkey
@@ -0,0 +1,22 @@
+import pygame
+
+from src.collision import push_out, sweep
+
+
+def test_sweep_stops_on_floor():
+    contact = sweep(pygame.Rect(0, 0, 10, 10), (0, 20), [pygame.Rect(-50, 15, 100, 10)])
+    assert contact.normal == (0, -1) and contact.time == 0.25
+
+
+def test_push_out_of_deep_block():
+    # Sunk into a wide merged block, the shortest way out is up
+    floor = pygame.Rect(-500, 100, 1000, 500)
+    assert push_out(pygame.Rect(0, 50, 64, 64), [floor]) == (0, -14)
+
+
+def test_push_out_of_two_blocks():
+    wall = pygame.Rect(60, 0, 100, 200)
+    floor = pygame.Rect(-100, 110, 300, 100)
+    x, y = push_out(pygame.Rect(0, 50, 64, 64), [wall, floor])
+    assert (x, y) == (-4, -4)
+    assert pygame.Rect(x, 50 + y, 64, 64).collidelist([wall, floor]) == -1
@@ -0,0 +1,29 @@
+from argparse import ArgumentTypeError
+
+import pytest
+
+from src.controls import Actions, Replay, ReplayControls, InputRecorder, ScriptedControls, seed_argument
+from src.headless import Simulation
+from src.settings import SIMULATION_FPS
+
+
+def test_seed_argument_fits_replay_header():
+    assert seed_argument('0') == 0
+    assert seed_argument(str(2 ** 32 - 1)) == 2 ** 32 - 1
+    for value in ('-1', str(2 ** 32)):
+        with pytest.raises(ArgumentTypeError):
+            seed_argument(value)
+
+
+def test_replay_plays_on_recorded_level(tmp_path):
+    recording = Replay(7, 1 / SIMULATION_FPS, 'map_test_2')
+    controls = InputRecorder(ScriptedControls(lambda frame: Actions(move=1, jump=frame % 40 < 5)), recording)
+    simulation = Simulation(7, controls=controls, level_name='map_test_2')
+    simulation.run(240)
+    recording.save(tmp_path / 'run.mvrp')
+
+    replay = Replay.load(tmp_path / 'run.mvrp')
+    assert replay.level_name == 'map_test_2'
+    playback = Simulation(replay.seed, replay.dt, controls=ReplayControls(replay), level_name=replay.level_name)
+    playback.run_replay()
+    assert playback.state_digest() == simulation.state_digest()
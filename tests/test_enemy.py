@@ -0,0 +1,21 @@
+import pytest
+
+from src.enemy import patrol_catch_up
+
+
+def test_patrol_catch_up_turns_at_bounds():
+    assert patrol_catch_up(150, 2, 100, 200, 20) == (190, 2)
+    assert patrol_catch_up(150, 2, 100, 200, 30) == (190, -2)
+    assert patrol_catch_up(150, -2, 100, 200, 40) == (130, 2)
+
+
+def test_patrol_catch_up_arrays_match_single_values():
+    np = pytest.importorskip('numpy')
+    rng = np.random.default_rng(0)
+    pos_x = rng.uniform(100, 200, 50)
+    speed = rng.choice([-3.0, -1.0, 1.0, 3.0], 50)
+    elapsed = rng.uniform(0, 500, 50)
+    batch_x, batch_speed = patrol_catch_up(pos_x, speed, np.full(50, 100.0), np.full(50, 200.0), elapsed)
+    for i in range(50):
+        assert (batch_x[i], batch_speed[i]) == patrol_catch_up(float(pos_x[i]), float(speed[i]), 100.0, 200.0,
+                                                               float(elapsed[i]))
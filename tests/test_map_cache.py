@@ -0,0 +1,12 @@
+from src.map_cache import read_map, cache_valid
+
+
+def test_cache_follows_tilesets_and_images():
+    data = read_map('map_test')
+    assert cache_valid(data)
+    assert {'data/map_test.tmx', 'data/tilesets/terrain.tsx', 'graphics/tileset_64x64(new).png'} <= set(data['sources'])
+
+    for key in ('data/tilesets/terrain.tsx', 'graphics/tileset_64x64(new).png'):
+        stale = dict(data, sources=dict(data['sources']))
+        stale['sources'][key] -= 1
+        assert not cache_valid(stale)
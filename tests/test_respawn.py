@@ -0,0 +1,43 @@
+from src.headless import Simulation
+from src.level_data import LEVELS
+
+
+def kill_on_enemy(simulation: Simulation, enemy) -> bool:
+    # The enemy is kept on the body until the player is back, returns whether the player died
+    level = simulation.level
+    level.player.health = 1
+    level.place_player(enemy.rect.topleft)
+
+    died = False
+    for _ in range(3000):
+        if not level.player.alive():
+            died = True
+            enemy.pos.update(level.player.rect.topleft)
+            enemy.rect.topleft = level.player.rect.topleft
+        elif died and not level.respawn:
+            break
+        simulation.step()
+    return died
+
+
+def test_respawn_with_enemy_on_body():
+    simulation = Simulation(seed=1)
+    level = simulation.level
+    simulation.run(5)
+
+    assert kill_on_enemy(simulation, next(iter(level.enemy_sprites)))
+    assert level.player.alive() and not level.respawn
+    assert level.player.health == level.player.max_health
+
+
+def test_respawn_before_any_checkpoint():
+    simulation = Simulation(seed=1)
+    level = simulation.level
+    level.load_map('map_test_2', *LEVELS['map_test_2']['map_test'])
+    entry = level.player.rect.topleft
+    assert level.last_checkpoint is None
+
+    assert kill_on_enemy(simulation, level.world.current.enemies[0])
+    assert level.player.alive() and not level.respawn
+    assert level.current_level == 'map_test_2'
+    assert level.player.rect.topleft == entry
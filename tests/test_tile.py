@@ -0,0 +1,12 @@
+import pygame
+
+from src.spatial import SpatialGroup
+from src.tile import ExitTile
+
+
+def test_exit_spanning_grid_cells_is_found():
+    exit_sprites = SpatialGroup()
+    exit_sprite = ExitTile('map_test', 'map_test_2', (0, 128), 64, 192, [exit_sprites])
+    player_rect = pygame.Rect(0, 280, 64, 64)
+    assert exit_sprite.rect.colliderect(player_rect)
+    assert exit_sprites.collide(player_rect) == [exit_sprite]
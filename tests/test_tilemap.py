@@ -0,0 +1,27 @@
+import math
+
+from src.settings import TILE_SIZE
+from src.tilemap import TileMap
+
+
+def make_map() -> TileMap:
+    tile_map = TileMap((0, 0), 10, 5, [None, None])
+    tile_map.set_tile(6, 2, 1)
+    return tile_map
+
+
+def test_raycast_hits_tile():
+    distance, cell = make_map().raycast((TILE_SIZE / 2, TILE_SIZE * 2.5), (1, 0), math.inf)
+    assert cell == (6, 2) and distance == TILE_SIZE * 5.5
+
+
+def test_raycast_enters_grid_from_outside():
+    hit = make_map().raycast((-TILE_SIZE * 3, TILE_SIZE * 2.5), (1, 0), math.inf)
+    assert hit[1] == (6, 2)
+
+
+def test_raycast_leaves_grid_without_max_distance():
+    tile_map = make_map()
+    assert tile_map.raycast((TILE_SIZE / 2, TILE_SIZE / 2), (1, 0), math.inf) is None
+    assert tile_map.raycast((TILE_SIZE / 2, TILE_SIZE / 2), (-1, -1), math.inf) is None
+    assert tile_map.raycast((-TILE_SIZE, -TILE_SIZE), (0, -1), math.inf) is None